@@ -0,0 +1,51 @@
+# Startup cost of the engine package: how long a fresh interpreter takes to import it compared
+# with a bare interpreter, and which heavy modules the import pulls in. Pool workers and short
+# CLI runs pay this on every start.
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+CODE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+CASES = {
+    'bare interpreter': 'pass',
+    'import enigma': 'import enigma',
+    'import enigma and load NumPy': 'import enigma; enigma.load_numpy()',
+}
+
+HEAVY_MODULES = ['numpy', 'PyQt5', 'concurrent.futures']
+
+def time_case(code, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], cwd=CODE_DIR, check=True)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return {'best_ms': timings[0] * 1000, 'median_ms': timings[len(timings) // 2] * 1000}
+
+def loaded_heavy_modules():
+    code = f'import sys, enigma; print(" ".join(m for m in {HEAVY_MODULES!r} if m in sys.modules))'
+    output = subprocess.run([sys.executable, '-c', code], cwd=CODE_DIR, check=True, capture_output=True, text=True)
+    return output.stdout.split()
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the startup cost of the enigma package")
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--json', help="Write the results to this file")
+    args = parser.parse_args()
+
+    results = {name: time_case(code, args.runs) for name, code in CASES.items()}
+    results['heavy modules loaded by import enigma'] = loaded_heavy_modules()
+
+    for name, result in results.items():
+        print(f"{name}: {result}")
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+if __name__ == '__main__':
+    main()
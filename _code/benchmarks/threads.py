@@ -0,0 +1,104 @@
+# Scaling of one shared CompiledKey across a thread pool. Runs the same batch of messages with
+# 1, 2, 4, ... threads and reports messages per second and the speedup over one thread. On a
+# regular build the GIL serialises the per-character compiled engine, so it is only expected to
+# scale on free-threaded builds (python3.13t and later); the NumPy engine scales partly either way.
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from enigma import ALPHABET, CompiledKey, load_numpy, make_settings
+from enigma.catalog import ROTORS
+
+def gil_enabled():
+    # sys._is_gil_enabled only exists from 3.13 on; older builds always have the GIL
+    check = getattr(sys, '_is_gil_enabled', None)
+    return True if check is None else check()
+
+def make_key(rotor_count, rng):
+    numbers = rng.sample(sorted(ROTORS, key=int), rotor_count)
+    letters = rng.sample(ALPHABET, 20)
+    plugboard = dict(zip(letters[::2], letters[1::2]))
+    plugboard.update(zip(letters[1::2], letters[::2]))
+    settings = make_settings([ROTORS[number] for number in numbers], [rng.randrange(26) for _ in numbers],
+                             [rng.randrange(26) for _ in numbers], plugboard=plugboard)
+    return CompiledKey.from_settings(settings)
+
+def run_case(key, messages, backend, threads, repeats):
+    encrypt = lambda message: key.encrypt_decrypt(message, backend=backend)
+    timings = []
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        # One warm-up round, so thread start-up is not timed
+        list(executor.map(encrypt, messages[:threads]))
+        for _ in range(repeats):
+            start = time.perf_counter()
+            list(executor.map(encrypt, messages))
+            timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def parse_list(kind):
+    return lambda text: [kind(value) for value in text.split(',')]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark one CompiledKey shared by a thread pool")
+    parser.add_argument('--threads', type=parse_list(int), default=[1, 2, 4, 8])
+    parser.add_argument('--rotors', type=int, default=3)
+    parser.add_argument('--messages', type=int, default=256)
+    parser.add_argument('--backend', choices=['auto', 'compiled', 'numpy'], default='compiled')
+    parser.add_argument('--size', type=int, default=2000, help="Characters per message")
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='threads_results.json')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    key = make_key(args.rotors, rng)
+    alphabet = ALPHABET + ALPHABET.lower() + ' .,'
+    messages = [''.join(rng.choice(alphabet) for _ in range(args.size)) for _ in range(args.messages)]
+
+    print(f"Python {sys.version.split()[0]}, GIL {'enabled' if gil_enabled() else 'disabled'}, "
+          f"{os.cpu_count()} CPUs")
+    results = []
+    baseline = None
+    for threads in args.threads:
+        seconds = run_case(key, messages, args.backend, threads, args.repeats)
+        baseline = baseline or seconds
+        result = {
+            'threads': threads,
+            'seconds': seconds,
+            'messages_per_sec': args.messages / seconds,
+            'chars_per_sec': args.messages * args.size / seconds,
+            'speedup': baseline / seconds,
+        }
+        results.append(result)
+        print(f"threads={threads:<3} {result['messages_per_sec']:>10,.0f} messages/s "
+              f"{result['chars_per_sec']:>14,.0f} chars/s  speedup {result['speedup']:.2f}x")
+
+    numpy = load_numpy()
+    report = {
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'python': sys.version,
+        'gil_enabled': gil_enabled(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'numpy': numpy.__version__ if numpy is not None else None,
+        'backend': args.backend,
+        'rotors': args.rotors,
+        'messages': args.messages,
+        'size': args.size,
+        'seed': args.seed,
+        'results': results,
+    }
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f"Results written to {args.output}")
+
+if __name__ == '__main__':
+    main()
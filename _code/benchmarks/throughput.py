@@ -0,0 +1,132 @@
+# Throughput of the encryption engines across rotor counts, message sizes, plugboard densities
+# and non-letter ratios. Reports characters per second, per-character latency and peak traced
+# memory, and writes everything to JSON so runs can be compared over time.
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from enigma import ALPHABET, DEFAULT_REFLECTOR, EnigmaMachine, Plugboard, Reflector, Rotor, load_numpy
+from enigma.catalog import ROTORS
+
+ENGINES = {
+    'reference': lambda machine, message: machine.encrypt_decrypt(message, backend='reference'),
+    'python': lambda machine, message: machine.encrypt_decrypt(message, backend='table'),
+    'compiled': lambda machine, message: machine.encrypt_decrypt(message, backend='compiled'),
+    'numpy': lambda machine, message: machine.encrypt_decrypt(message, backend='numpy'),
+    'auto': lambda machine, message: machine.encrypt_decrypt(message),
+    'bytes': lambda machine, message: machine.encrypt_decrypt_bytes(message.encode('ascii')),
+    'into': lambda machine, message: machine.encrypt_into(message.encode('ascii'), bytearray(len(message))),
+}
+
+NON_LETTERS = b" .,;:!?'-\n0123456789"
+
+def make_machine(rotor_count, plugboard_pairs, rng):
+    rotors = []
+    for number in rng.sample(sorted(ROTORS, key=int), rotor_count):
+        rotor = Rotor(ROTORS[number])
+        rotor.set_position(rng.randrange(26))
+        rotor.set_notch(rng.randrange(26))
+        rotors.append(rotor)
+
+    letters = rng.sample(ALPHABET, plugboard_pairs * 2)
+    wiring = {}
+    for first, second in zip(letters[::2], letters[1::2]):
+        wiring[first] = second
+        wiring[second] = first
+    return EnigmaMachine(rotors, Reflector(DEFAULT_REFLECTOR), Plugboard(wiring))
+
+def make_message(size, non_letter_ratio, rng):
+    # Random bytes mapped to mixed-case letters or, for the requested share of byte values,
+    # to spaces, punctuation and digits
+    cutoff = round(non_letter_ratio * 256)
+    letters = (ALPHABET + ALPHABET.lower()).encode('ascii')
+    table = bytes(NON_LETTERS[value % len(NON_LETTERS)] if value < cutoff else letters[value % len(letters)]
+                  for value in range(256))
+    return rng.randbytes(size).translate(table).decode('ascii')
+
+def run_case(engine, rotor_count, size, plugboard_pairs, non_letter_ratio, seed, measure_memory):
+    rng = random.Random(seed)
+    message = make_message(size, non_letter_ratio, rng)
+    encrypt = ENGINES[engine]
+
+    machine = make_machine(rotor_count, plugboard_pairs, random.Random(seed))
+    start = time.perf_counter()
+    encrypt(machine, message)
+    seconds = time.perf_counter() - start
+
+    result = {
+        'engine': engine,
+        'rotors': rotor_count,
+        'size': size,
+        'plugboard_pairs': plugboard_pairs,
+        'non_letter_ratio': non_letter_ratio,
+        'seconds': seconds,
+        'chars_per_sec': size / seconds if seconds else None,
+        'ns_per_char': seconds * 1e9 / size if size else None,
+    }
+
+    # Memory is measured on a second run, so tracing does not distort the timing
+    if measure_memory:
+        machine = make_machine(rotor_count, plugboard_pairs, random.Random(seed))
+        tracemalloc.start()
+        encrypt(machine, message)
+        result['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+def parse_list(kind):
+    return lambda text: [kind(value) for value in text.split(',')]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Enigma encryption engines")
+    parser.add_argument('--engines', type=parse_list(str), default=list(ENGINES))
+    parser.add_argument('--rotors', type=parse_list(int), default=[1, 3, 10, 50, 100])
+    parser.add_argument('--sizes', type=parse_list(int), default=[100, 10_000, 1_000_000, 100_000_000])
+    parser.add_argument('--plugboard-pairs', type=parse_list(int), default=[0, 10])
+    parser.add_argument('--non-letter-ratios', type=parse_list(float), default=[0.0, 0.5, 0.9])
+    parser.add_argument('--max-python-size', type=int, default=1_000_000,
+                        help="Skip larger messages for the per-character Python engines")
+    parser.add_argument('--no-memory', action='store_true', help="Skip the peak memory run")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='benchmark_results.json')
+    args = parser.parse_args()
+
+    numpy = load_numpy()
+    engines = [engine for engine in args.engines if engine != 'numpy' or numpy is not None]
+    results = []
+    for engine in engines:
+        for rotor_count in args.rotors:
+            for size in args.sizes:
+                if engine in ('reference', 'python', 'compiled') and size > args.max_python_size:
+                    continue
+                for plugboard_pairs in args.plugboard_pairs:
+                    for non_letter_ratio in args.non_letter_ratios:
+                        result = run_case(engine, rotor_count, size, plugboard_pairs, non_letter_ratio,
+                                          args.seed, not args.no_memory)
+                        results.append(result)
+                        print(f"{engine:>6} rotors={rotor_count:<3} size={size:<10} plugs={plugboard_pairs:<2} "
+                              f"non-letters={non_letter_ratio:<4} {result['chars_per_sec'] or 0:>14,.0f} chars/s "
+                              f"{result['ns_per_char'] or 0:>10,.1f} ns/char")
+
+    report = {
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'python': sys.version,
+        'platform': platform.platform(),
+        'numpy': numpy.__version__ if numpy is not None else None,
+        'seed': args.seed,
+        'results': results,
+    }
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f"Results written to {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -269,4 +269,5 @@ def interactive_enigma():
     print("Thank you for using the Interactive Enigma Machine!")
 
 # Run the interactive Enigma machine
-interactive_enigma()
+if __name__ == '__main__':
+    interactive_enigma()
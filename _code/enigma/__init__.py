@@ -0,0 +1,25 @@
+# Core Enigma engine: no import-time side effects and no GUI dependency. NumPy is optional and
+# only loaded by the vectorized paths when they are first used.
+from .core import (
+    ALPHABET,
+    BACKENDS,
+    DEFAULT_REFLECTOR,
+    LETTER_INDEX,
+    EnigmaMachine,
+    Plugboard,
+    Reflector,
+    Rotor,
+    count_carries,
+    load_numpy,
+    normalize_notch,
+    select_backend,
+    turnover_table,
+)
+from .alphabet import ByteEnigmaMachine
+from .bank import MachineBank
+from .batch import encrypt_decrypt_batch
+from .checkpoint import Checkpoint
+from .key import CompiledKey, KeyState
+from .keystream import KeystreamTable
+from .settings import MachineCache, Settings, make_settings
+from .stats import MachineStats
@@ -0,0 +1,136 @@
+from .core import count_carries, load_numpy, normalize_notch, turnover_table
+
+class ByteEnigmaMachine:
+    # Same machine as EnigmaMachine, but over an alphabet of any K distinct byte values (for
+    # example the 26 letters, 36 alphanumerics or all 256 bytes) and working on bytes directly.
+    # rotors is a list of (wiring, position, notch) with every wiring a permutation of the
+    # alphabet and notch a position or a tuple of positions. Bytes outside the alphabet pass through unchanged and still step the rotors;
+    # there is no case folding.
+    def __init__(self, alphabet, rotors, reflector, plugboard=None):
+        self.alphabet = bytes(alphabet)
+        self.size = size = len(self.alphabet)
+        if not size or len(set(self.alphabet)) != size:
+            raise ValueError("The alphabet must consist of unique byte values.")
+
+        self.index = [-1] * 256
+        for code, value in enumerate(self.alphabet):
+            self.index[value] = code
+
+        self.forward_tables = []
+        self.backward_tables = []
+        self.start_positions = []
+        self.notches = []
+        for wiring, position, notch in rotors:
+            wiring = self._permutation(wiring)
+            inverse = [0] * size
+            for code, value in enumerate(wiring):
+                inverse[value] = code
+            self.forward_tables.append([bytes((wiring[(code + shift) % size] - shift) % size for code in range(size))
+                                        for shift in range(size)])
+            self.backward_tables.append([bytes((inverse[(code + shift) % size] - shift) % size for code in range(size))
+                                         for shift in range(size)])
+            self.start_positions.append(position % size)
+            self.notches.append(normalize_notch(notch, size))
+        self.reflector = bytes(self._permutation(reflector))
+
+        plugboard_table = list(range(size))
+        for key, value in (plugboard or {}).items():
+            plugboard_table[self._code(key)] = self._code(value)
+        self.plugboard = bytes(plugboard_table)
+
+        self.turnovers = [turnover_table(notch, size) for notch in self.notches]
+        self.positions = list(self.start_positions)
+        self.steps = 0
+        self._arrays = None
+
+    def _code(self, value):
+        if isinstance(value, (bytes, bytearray)):
+            value, = value
+        code = self.index[value]
+        if code < 0:
+            raise ValueError(f"{value!r} is not in the alphabet.")
+        return code
+
+    def _permutation(self, wiring):
+        wiring = [self._code(value) for value in bytes(wiring)]
+        if sorted(wiring) != list(range(self.size)):
+            raise ValueError(f"Wirings must consist of {self.size} unique alphabet values.")
+        return wiring
+
+    def tell(self):
+        return self.steps
+
+    def seek(self, steps):
+        if steps < 0:
+            raise ValueError("Cannot seek to a negative step")
+
+        self.steps = steps
+        for level, position in enumerate(self.start_positions):
+            self.positions[level] = (position + steps) % self.size
+            steps = count_carries(steps, position, self.notches[level], self.size)
+
+    def encrypt_decrypt(self, data):
+        if load_numpy() is not None:
+            return self._encrypt_decrypt_numpy(data)
+
+        output = bytearray(data)
+        index, size, alphabet = self.index, self.size, self.alphabet
+        plugboard, reflector = self.plugboard, self.reflector
+        forward_tables, backward_tables = self.forward_tables, self.backward_tables
+        positions, turnovers = self.positions, self.turnovers
+        count = len(positions)
+
+        for offset, value in enumerate(output):
+            code = index[value]
+            if code >= 0:
+                code = plugboard[code]
+                for table, position in zip(forward_tables, positions):
+                    code = table[position][code]
+                code = reflector[code]
+                for level in range(count - 1, -1, -1):
+                    code = backward_tables[level][positions[level]][code]
+                output[offset] = alphabet[plugboard[code]]
+
+            level = 0
+            while level < count:
+                positions[level] = (positions[level] + 1) % size
+                if not turnovers[level][positions[level]]:
+                    break
+                level += 1
+
+        self.steps += len(output)
+        return bytes(output)
+
+    def _encrypt_decrypt_numpy(self, data):
+        np = load_numpy()
+        size = self.size
+        if self._arrays is None:
+            self._arrays = (
+                np.array(self.index, dtype=np.int16),
+                [np.frombuffer(b''.join(tables), dtype=np.uint8).reshape(size, size) for tables in self.forward_tables],
+                [np.frombuffer(b''.join(tables), dtype=np.uint8).reshape(size, size) for tables in self.backward_tables],
+            )
+        index, forward_tables, backward_tables = self._arrays
+
+        values = np.frombuffer(bytes(data), dtype=np.uint8)
+        codes = index[values]
+        is_symbol = codes >= 0
+        steps = np.flatnonzero(is_symbol)
+        output = values.copy()
+
+        if len(steps):
+            plugboard = np.frombuffer(self.plugboard, dtype=np.uint8)
+            code = plugboard[codes[is_symbol]]
+            levels = []
+            for level, position in enumerate(self.positions):
+                positions = (position + steps) % size
+                levels.append((level, positions))
+                code = forward_tables[level][positions, code]
+                steps = count_carries(steps, position, self.notches[level], size)
+            code = np.frombuffer(self.reflector, dtype=np.uint8)[code]
+            for level, positions in reversed(levels):
+                code = backward_tables[level][positions, code]
+            output[is_symbol] = np.frombuffer(self.alphabet, dtype=np.uint8)[plugboard[code]]
+
+        self.seek(self.steps + len(values))
+        return output.tobytes()
@@ -0,0 +1,157 @@
+from .core import ALPHABET, EnigmaMachine, Plugboard, Reflector, Rotor, load_numpy
+
+class MachineBank:
+    # M machines kept as a handful of contiguous arrays instead of M EnigmaMachine objects, and
+    # stepped and encrypted together, one vectorized operation per rotor level. Rotor and
+    # reflector tables are shared; per machine the bank keeps, for every rotor level, a table
+    # index, a position and a notch bit mask, plus a 26-byte plugboard and a reflector index.
+    # Three rotors come to 45 bytes a machine.
+    #
+    # Built from a list of Settings. Shorter rotor stacks are topped up with identity rotors,
+    # which leave every letter alone and never carry.
+    def __init__(self, settings_list):
+        np = load_numpy()
+        if np is None:
+            raise RuntimeError("NumPy is required for MachineBank")
+
+        count = len(settings_list)
+        depth = max((len(settings.rotors) for settings in settings_list), default=0)
+        wiring_ids = {None: 0}
+        reflector_ids = {}
+        forward_tables = [[list(range(26))] * 26]
+        backward_tables = [[list(range(26))] * 26]
+        reflector_tables = []
+        for settings in settings_list:
+            for wiring in settings.rotors:
+                if wiring not in wiring_ids:
+                    wiring_ids[wiring] = len(forward_tables)
+                    forward, backward = Rotor(wiring).compile()
+                    forward_tables.append(forward)
+                    backward_tables.append(backward)
+            if settings.reflector not in reflector_ids:
+                reflector_ids[settings.reflector] = len(reflector_tables)
+                reflector_tables.append(Reflector(settings.reflector).compile())
+
+        # Shared tables, flat so a lookup is a single gather: [wiring, position, letter]
+        self.wirings = [wiring for wiring in wiring_ids if wiring is not None]
+        self.reflectors = list(reflector_ids)
+        self.forward = np.array(forward_tables, dtype=np.uint8).reshape(-1)
+        self.backward = np.array(backward_tables, dtype=np.uint8).reshape(-1)
+        self.reflector_tables = np.array(reflector_tables, dtype=np.uint8).reshape(-1)
+
+        # Per machine, one row per rotor level
+        self.rotor_ids = np.zeros((depth, count), dtype=np.uint8 if len(forward_tables) <= 256 else np.uint16)
+        self.positions = np.zeros((depth, count), dtype=np.uint8)
+        self.notch_masks = np.zeros((depth, count), dtype=np.uint32)
+        self.reflector_ids = np.empty(count, dtype=np.uint8 if len(reflector_tables) <= 256 else np.uint16)
+        self.plugboards = np.empty((count, 26), dtype=np.uint8)
+        for machine, settings in enumerate(settings_list):
+            for level, (wiring, position, notch) in enumerate(zip(settings.rotors, settings.positions,
+                                                                  settings.notches)):
+                self.rotor_ids[level, machine] = wiring_ids[wiring]
+                self.positions[level, machine] = position
+                self.notch_masks[level, machine] = sum(1 << value for value in
+                                                       (notch if isinstance(notch, tuple) else (notch,)))
+            self.reflector_ids[machine] = reflector_ids[settings.reflector]
+            self.plugboards[machine] = Plugboard(dict(settings.plugboard)).compile()
+        self.steps = 0
+
+    def __len__(self):
+        return len(self.reflector_ids)
+
+    def bytes_per_machine(self):
+        arrays = (self.rotor_ids, self.positions, self.notch_masks, self.reflector_ids, self.plugboards)
+        return sum(array.nbytes for array in arrays) / max(len(self), 1)
+
+    def step(self, count=1):
+        # Every machine takes count keypresses. Only the first rotor moves on every keypress; a
+        # level is only touched while some machine still carries into it.
+        np = load_numpy()
+        depth = len(self.positions)
+        for _ in range(count):
+            for level in range(depth):
+                positions = self.positions[level]
+                if level:
+                    np.add(positions, carry, out=positions, casting='unsafe')
+                else:
+                    np.add(positions, 1, out=positions)
+                np.remainder(positions, 26, out=positions)
+                if level + 1 == depth:
+                    break
+                # A rotor only carries if it moved onto a notch, not if it rests on one
+                at_notch = (self.notch_masks[level] >> positions) & 1
+                carry = at_notch if not level else carry & at_notch
+                if not carry.any():
+                    break
+        self.steps += count
+
+    def encrypt_decrypt(self, data):
+        # data is one ASCII message for every machine (str or bytes-like), or an [M, L] uint8
+        # array with a message per machine. Returns an [M, L] uint8 array. As with
+        # encrypt_decrypt_bytes, letters come out upper-case and every other byte passes
+        # through unchanged, still stepping the rotors.
+        np = load_numpy()
+        if isinstance(data, str):
+            data = data.encode('ascii')
+        data = np.asarray(data, dtype=np.uint8) if isinstance(data, np.ndarray) else \
+            np.frombuffer(bytes(data), dtype=np.uint8)
+        count = len(self)
+        shared = data.ndim == 1
+        if not shared and data.shape[0] != count:
+            raise ValueError(f"Expected one message per machine ({count}), got {data.shape[0]}")
+        length = data.shape[-1]
+
+        codes = np.full(256, 255, dtype=np.uint8)
+        codes[ord('A'):ord('Z') + 1] = codes[ord('a'):ord('z') + 1] = np.arange(26)
+        letters = np.frombuffer(ALPHABET.encode('ascii'), dtype=np.uint8)
+        plugboard_rows = np.arange(count, dtype=np.intp) * 26
+        reflector_rows = self.reflector_ids.astype(np.intp) * 26
+        plugboards = self.plugboards.reshape(-1)
+        rotor_rows = [rotor_ids.astype(np.intp) * 26 * 26 for rotor_ids in self.rotor_ids]
+        output = np.empty((length, count), dtype=np.uint8)
+
+        for offset in range(length):
+            column = data[offset] if shared else data[:, offset]
+            if shared:
+                code = codes[column]
+                if code == 255:
+                    output[offset] = column
+                    self.step()
+                    continue
+                code = np.full(count, code, dtype=np.intp)
+            else:
+                code = codes[column].astype(np.intp)
+                is_letter = code != 255
+                np.minimum(code, 25, out=code)
+
+            code = plugboards[plugboard_rows + code]
+            tables = []
+            for rows, positions in zip(rotor_rows, self.positions):
+                table = rows + positions.astype(np.intp) * 26
+                tables.append(table)
+                code = self.forward[table + code]
+            code = self.reflector_tables[reflector_rows + code]
+            for table in reversed(tables):
+                code = self.backward[table + code]
+            code = letters[plugboards[plugboard_rows + code]]
+
+            output[offset] = code if shared else np.where(is_letter, code, column)
+            self.step()
+        return np.ascontiguousarray(output.T)
+
+    def machine(self, index):
+        # Machine index as an EnigmaMachine at its current positions, for checking a candidate
+        # or handing it to the rest of the package
+        rotors = []
+        for level in range(len(self.positions)):
+            rotor_id = int(self.rotor_ids[level, index])
+            mask = int(self.notch_masks[level, index])
+            if not rotor_id:
+                continue
+            rotor = Rotor(self.wirings[rotor_id - 1])
+            rotor.set_position(int(self.positions[level, index]))
+            rotor.set_notch(tuple(value for value in range(26) if mask >> value & 1))
+            rotors.append(rotor)
+        plugboard = {ALPHABET[code]: ALPHABET[value] for code, value in enumerate(self.plugboards[index])
+                     if code != value}
+        return EnigmaMachine(rotors, Reflector(self.reflectors[self.reflector_ids[index]]), Plugboard(plugboard))
@@ -0,0 +1,97 @@
+from .core import DEFAULT_REFLECTOR, Plugboard, Reflector, Rotor, count_carries, load_numpy, normalize_notch
+from .settings import check_settings
+
+def _compile_settings(settings):
+    wirings = [wiring.upper() for wiring in settings['rotors']]
+    positions = [int(position) % 26 for position in settings['positions']]
+    notches = [normalize_notch(notch) for notch in settings['notches']]
+    reflector = settings.get('reflector', DEFAULT_REFLECTOR).upper()
+
+    check_settings(wirings, positions, notches, reflector)
+
+    plugboard = Plugboard(settings.get('plugboard')).compile()
+    return wirings, positions, notches, Reflector(reflector).compile(), plugboard
+
+def encrypt_decrypt_batch(jobs):
+    # jobs is a list of (settings, message) pairs. settings is a dict with the rotor wirings under
+    # 'rotors', 'positions', 'notches' and optionally 'reflector' and a 'plugboard' dict. Every
+    # message starts from its own settings and all of them go through the machine in one
+    # vectorized pass. Returns one (result, error) pair per job.
+    np = load_numpy()
+    if np is None:
+        raise RuntimeError("NumPy is required for encrypt_decrypt_batch")
+
+    results = [(None, None)] * len(jobs)
+    accepted = []
+    for number, (settings, message) in enumerate(jobs):
+        try:
+            if not isinstance(message, str):
+                raise TypeError(f"Expected a str message, got {type(message).__name__}")
+            accepted.append((number, _compile_settings(settings), message.upper()))
+        except (AttributeError, KeyError, TypeError, ValueError) as error:
+            results[number] = (None, error)
+    if not accepted:
+        return results
+
+    # Pack the settings into arrays. Shorter rotor stacks are topped up with identity rotors,
+    # which leave every letter alone wherever they stand. Every rotor gets as many notch slots
+    # as the rotor with the most notches; unused slots hold -1 and never carry.
+    table_ids = {}
+    forward_tables = [[list(range(26))] * 26]
+    backward_tables = [[list(range(26))] * 26]
+    depth = max(len(wirings) for _, (wirings, *_), _ in accepted)
+    rotor_tables = np.zeros((len(accepted), depth), dtype=np.intp)
+    start_positions = np.zeros((len(accepted), depth), dtype=np.intp)
+    width = max((len(notch) if isinstance(notch, tuple) else 1
+                 for _, (_, _, notch_positions, _, _), _ in accepted for notch in notch_positions), default=1)
+    notches = np.full((len(accepted), depth, width), -1, dtype=np.intp)
+    reflectors = np.empty((len(accepted), 26), dtype=np.uint8)
+    plugboards = np.empty((len(accepted), 26), dtype=np.uint8)
+    for row, (_, (wirings, positions, notch_positions, reflector, plugboard), _) in enumerate(accepted):
+        for level, wiring in enumerate(wirings):
+            if wiring not in table_ids:
+                table_ids[wiring] = len(forward_tables)
+                forward, backward = Rotor(wiring).compile()
+                forward_tables.append(forward)
+                backward_tables.append(backward)
+            rotor_tables[row, level] = table_ids[wiring]
+        start_positions[row, :len(positions)] = positions
+        for level, notch in enumerate(notch_positions):
+            notch = notch if isinstance(notch, tuple) else (notch,)
+            notches[row, level, :len(notch)] = notch
+        reflectors[row] = reflector
+        plugboards[row] = plugboard
+    forward_tables = np.array(forward_tables, dtype=np.uint8)
+    backward_tables = np.array(backward_tables, dtype=np.uint8)
+
+    # All messages end to end, with the message row and the keypress number of every character
+    lengths = np.array([len(upper) for _, _, upper in accepted], dtype=np.intp)
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    codes = np.frombuffer(''.join(upper for _, _, upper in accepted).encode('utf-32-le'), dtype=np.uint32).copy()
+    rows = np.repeat(np.arange(len(accepted)), lengths)
+    steps = np.arange(len(codes)) - np.repeat(offsets[:-1], lengths)
+
+    is_letter = (codes >= ord('A')) & (codes <= ord('Z'))
+    rows = rows[is_letter]
+    steps = steps[is_letter]
+    code = plugboards[rows, codes[is_letter] - ord('A')]
+
+    levels = []
+    for level in range(depth):
+        tables = rotor_tables[rows, level]
+        positions = (start_positions[rows, level] + steps) % 26
+        levels.append((tables, positions))
+        code = forward_tables[tables, positions, code]
+        carries = steps * 0
+        for slot in range(width):
+            slot_notches = notches[rows, level, slot]
+            carries += np.where(slot_notches >= 0, count_carries(steps, start_positions[rows, level], slot_notches), 0)
+        steps = carries
+    code = reflectors[rows, code]
+    for tables, positions in reversed(levels):
+        code = backward_tables[tables, positions, code]
+    codes[is_letter] = plugboards[rows, code] + ord('A')
+
+    for row, (number, _, _) in enumerate(accepted):
+        results[number] = (codes[offsets[row]:offsets[row + 1]].tobytes().decode('utf-32-le'), None)
+    return results
@@ -0,0 +1,103 @@
+# Rotor wirings shared by the interactive machine and the GUI, keyed by rotor number
+ROTORS = {
+    "1": "SAVJNMITYPOEFWUQZLBGKHXCDR",
+    "2": "LKJWSPFIYGMDQOZAERXTHVUBCN",
+    "3": "ZBJFAXHUTGVESDYMQIPWKRCLNO",
+    "4": "MXTDWJYQFNOVCPSUGIZLREHKAB",
+    "5": "BTJZRFLQICKSHEPOAVNXDGUMYW",
+    "6": "PBDMILKECVFUAZOSHWGJRYTQNX",
+    "7": "XODCYKNJRPSFVMZLATUEQIGWBH",
+    "8": "ZRLHTBCYGUOAJWKSQXNMVEPIDF",
+    "9": "XSYBPRJWEHAICKUFZVTOLGMNDQ",
+    "10": "FSUZWPADGEHCBQNJLTVXORKMYI",
+    "11": "FMAXBQDCTRHSIEVYPJNGOWLUZK",
+    "12": "KTBNZLUDVCJXIPFMEOHQGYARWS",
+    "13": "JWGCULEBSHATZKIQMROFDNYPVX",
+    "14": "TXRZPJFLNGSMHBAKOIDUYCVWEQ",
+    "15": "BQRFCKXAWMSTDHYZEGPLJUNIOV",
+    "16": "RPGDVLTZKYMFIAUJHBQXNOSWCE",
+    "17": "UNJTOVMQSEGZDCAHPWBFKRLXIY",
+    "18": "OVLCJXHSWZADPYTBIRMEKGFQUN",
+    "19": "IHXBFGLVNSJPAYQMWZTKOCUDER",
+    "20": "YSTJDROWCKULVBZFQHGAEIPXMN",
+    "21": "XNHSKMGOYCWJVQEZATILRPDBUF",
+    "22": "WKCIJYZFODBEXUARGNPVLHTQMS",
+    "23": "EHXGNCYASPQLFJVTMDWBRZKIUO",
+    "24": "FMTBLPIJGQDWKRVESHXOUCZNYA",
+    "25": "MUGFTOLIBJWQVYPHKNZRDXACES",
+    "26": "YSZUKLNGJITEQDVBPOCAFHRMXW",
+    "27": "SNICQZLKMJOXHABRPFYEDUWGVT",
+    "28": "OPYEWBQAZGJTXHCLUFNDIKRSVM",
+    "29": "WXUZEJGDVSHYFTQILAOMNPCRBK",
+    "30": "CDUGTEKXLMIRVQAWPNYFSBOHZJ",
+    "31": "IOSNDGKCAFQVXMZEWHBRPTLYJU",
+    "32": "JZHMXUFAWTNRDBPLKVGSYOQEIC",
+    "33": "FQURHXEGIAODBSZVWKTLYPMCJN",
+    "34": "ILRPGETQHUFJWXADBYOCSNZMKV",
+    "35": "OXLNEJPCIYGMWQRUTFASHZVDKB",
+    "36": "URGSLZMYEFDXIJTPVWAQHKCBON",
+    "37": "LGSFIYDHVUKRQAPMOXZNWEBTCJ",
+    "38": "HMJWQXCANPSUFOYZLTGRDBEVIK",
+    "39": "NLRETQUIDSAPKHZWXGVFJCBMYO",
+    "40": "DQMFZWRVNPHOLSBIJTEKCGUXYA",
+    "41": "YKQNOTVDWLXMZPSJABCIUEFHGR",
+    "42": "IMDUQZKWTGEAXNBLPSJROFCVHY",
+    "43": "UZAEFMNYPCTDXGLIRWSQOVKJHB",
+    "44": "LTVEFNBGJZSKQHUPDMWICXOAYR",
+    "45": "AIGEORXBTPYJZDUWCVMLFNSHQK",
+    "46": "SWABFLIJEXDRNVOCTGMHPQZYUK",
+    "47": "ODHGALECIMYFQUXTNJWRZPKBSV",
+    "48": "CUMHOBTJYXZLAQPFRGDNVIWESK",
+    "49": "LPVTZNYSQMOHAIRUKXGEFBDCWJ",
+    "50": "GVONKIJLYRMPZXSEWTUFQAHDCB",
+    "51": "WYLKCFAJVNMXEDUQTBOGIPZHSR",
+    "52": "JCOXUEMLPDBFIWZGANRKSQTHYV",
+    "53": "WALEHKBMGYRCVXTDUOSPJZFIQN",
+    "54": "ZBSUJALFWIHDQXVPRMYTCKGENO",
+    "55": "GNTSAPZLIVYRFCMDWXOQJEKHBU",
+    "56": "LICEZJUKBHGAOMNRVTQDFSPXYW",
+    "57": "AMRJEXYHUVDGCPZTSLFIBWKNQO",
+    "58": "TCJZLWEHIVRKGABSXNDPFQMYUO",
+    "59": "BLEFGSPIVOQXJHMDKUNWZYCRTA",
+    "60": "ZEYJMLVTKNCSXOAGRIQBFHPWUD",
+    "61": "NPRBIFELDKSMHJCWOGUTXAYZVQ",
+    "62": "LQPIYEFZTJCRUOGBKXAHDSNVWM",
+    "63": "OXQIZBGJHDCVTPRSELFYMKAUWN",
+    "64": "YCJITLBHESDPOZWAFVMQGUXKNR",
+    "65": "RPFOHELVIYZDWTGCUKBNAJXQMS",
+    "66": "PZTYCHKOUISDJFWAXEGLNMQRBV",
+    "67": "UASFPGQLZJROKXWBNYVDMEHTIC",
+    "68": "CVHYMIJAUDTGPFSEXOZWQRLNBK",
+    "69": "TMFWHBRUNKPQYLJAGZEOCDISVX",
+    "70": "PZOCKGQRXFMIEJANWLBDSUYVTH",
+    "71": "TXUVGASNPJRHYFDQBLMZKCIOWE",
+    "72": "GAVNCLIXTPFJRDUKHWOQZMSYEB",
+    "73": "OASBXUDGJQRMWCFHNETLYVPKIZ",
+    "74": "CAZXNBVLTDREIOYSUWQMGJHKPF",
+    "75": "OKZNWDHUMSRBVTIXEPCJAFYQGL",
+    "76": "KCBHEUSQMOLRIJTFAZYDWNPXGV",
+    "77": "OWGAXKFECPLDMZYTRIJHUNQVBS",
+    "78": "MRQYUWJEGONIXKVTBLCDHSAFPZ",
+    "79": "WGXYEOLQKFPIJSVRNTBCZDAHMU",
+    "80": "MKWAYIXNVJOUDLQRTCEPBGSHZF",
+    "81": "YRCLPFZHQBSOEDVKIGWTAUXMJN",
+    "82": "AVCYGRIUHBTOMFEPXNSQZKWJDL",
+    "83": "JHPVNKZMQBXDOULACWSYGTFERI",
+    "84": "CRNUFBLTVEYSJPWXGAOIMDHQKZ",
+    "85": "IVMEHTQADNJKPFZUBCSYLGXOWR",
+    "86": "ZEWADVMBSFUCGOIHTJXYRPNKLQ",
+    "87": "FODBGMUSVPJELYINWKTXCQZHRA",
+    "88": "NXGEDVYPQZSHWKRFAMILJTOUCB",
+    "89": "MVKYIGHQXNPLEWBSFUOZJTRCDA",
+    "90": "KDTCLBERAIPMUONQZHWYFSXGVJ",
+    "91": "SIHZWTREJPNQXOALVMDUBKFCGY",
+    "92": "XGPBJAHDZQKMNOCVSTYIURLFEW",
+    "93": "UEYTWNHRBZGQVLIAJMSCXDPKOF",
+    "94": "YAODGRBXLKCWFZHQSVIPUENJMT",
+    "95": "CXLGASYVZEJBUTRFHQPDNMKOIW",
+    "96": "GWIVYURFHTPDSOCQELMXJZABKN",
+    "97": "ATBKDXGPNEJYCISZMWQUROVHFL",
+    "98": "NUMRFXDCBJQPYVGTWIAZELKOSH",
+    "99": "EKGBUXCSFWVLNMAIDTHZRPYOJQ",
+    "100": "VSXUEMYRATDPWHJCLOGZQIFBKN",
+}
@@ -0,0 +1,34 @@
+import struct
+from collections import namedtuple
+
+CHECKPOINT_MAGIC = b'ENGM'
+CHECKPOINT_VERSION = 1
+
+# magic, version, settings hash, steps, source offset, destination offset, rotor count
+_HEADER = struct.Struct('<4sB8sQQQH')
+
+class Checkpoint(namedtuple('Checkpoint', ['settings_hash', 'steps', 'positions', 'source_offset',
+                                           'destination_offset'])):
+    # Where a machine stood at a chunk boundary: the keypresses since its start positions, the
+    # rotor positions they lead to and, for streaming and file jobs, how far the source had been
+    # read and the destination written. settings_hash ties it to one configuration, see
+    # EnigmaMachine.settings_hash. Packs into a blob of 39 bytes plus one per rotor.
+    __slots__ = ()
+
+    def to_bytes(self):
+        return _HEADER.pack(CHECKPOINT_MAGIC, CHECKPOINT_VERSION, self.settings_hash, self.steps,
+                            self.source_offset, self.destination_offset, len(self.positions)) + bytes(self.positions)
+
+    @classmethod
+    def from_bytes(cls, blob):
+        blob = bytes(blob)
+        if len(blob) < _HEADER.size:
+            raise ValueError("The checkpoint is truncated")
+        magic, version, settings_hash, steps, source_offset, destination_offset, count = _HEADER.unpack_from(blob)
+        if magic != CHECKPOINT_MAGIC:
+            raise ValueError("Not an Enigma checkpoint")
+        if version != CHECKPOINT_VERSION:
+            raise ValueError(f"Unsupported checkpoint version {version}")
+        if len(blob) != _HEADER.size + count:
+            raise ValueError("The checkpoint is truncated")
+        return cls(settings_hash, steps, blob[_HEADER.size:], source_offset, destination_offset)
@@ -0,0 +1,1051 @@
+import mmap
+import os
+import time
+from collections import OrderedDict
+
+from .checkpoint import Checkpoint
+from .stats import Instrumentation, MachineStats
+
+# Spelled out rather than taken from string.ascii_uppercase, which pulls re into the import
+ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+LETTER_INDEX = {letter: index for index, letter in enumerate(ALPHABET)}
+DEFAULT_REFLECTOR = "YRUHQSLDPXNGOKMIEBFZCWVJAT"
+
+# Upper-cases ASCII letters only, so the length of a message never changes
+ASCII_UPPER = str.maketrans(ALPHABET.lower(), ALPHABET)
+_lower_runs = None
+_non_letter_gaps = None
+
+# With preserve_case and without NumPy, runs of at least this many non-letters are skipped with
+# one seek instead of being stepped through character by character; shorter runs cost less than
+# the extra call
+NON_LETTER_SKIP_LENGTH = 64
+
+# NumPy is optional and only imported the first time a vectorized path needs it
+_numpy = None
+
+def load_numpy():
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            numpy = False
+        _numpy = numpy
+    return _numpy or None
+
+# Compiled tables shared by every Rotor with the same wiring and ring setting, built on first use.
+# Each is a least recently used cache of ROTOR_CACHE_SIZE entries; a Rotor that already holds its
+# tables keeps them. Both tolerate another thread evicting the entry they are looking at.
+ROTOR_CACHE_SIZE = 256
+_rotor_tables = OrderedDict()
+_rotor_arrays = OrderedDict()
+
+def _cached_tables(cache, key):
+    tables = cache.get(key)
+    if tables is not None:
+        try:
+            cache.move_to_end(key)
+        except KeyError:
+            pass
+    return tables
+
+def _cache_tables(cache, key, tables):
+    cache[key] = tables
+    while len(cache) > ROTOR_CACHE_SIZE:
+        try:
+            cache.popitem(last=False)
+        except KeyError:
+            break
+    return tables
+
+# The NumPy engine pays a fixed setup cost per call and per rotor before its gathers win over the
+# table loop; measured with benchmarks/throughput.py the crossover sits a little above 256
+# characters plus a few per rotor
+BACKENDS = ('reference', 'table', 'compiled', 'numpy')
+NUMPY_MIN_LENGTH = 256
+NUMPY_MIN_LENGTH_PER_ROTOR = 8
+
+# Without NumPy, a function generated for the configuration (see specialize.py) saves roughly
+# 200 ns per character over the table loop, which pays back generating and checking it, a few
+# milliseconds plus about half a millisecond per rotor, after this many characters
+COMPILED_MIN_LENGTH = 16384
+COMPILED_MIN_LENGTH_PER_ROTOR = 2048
+
+# Instrumented table loops time one keypress in this many and split the time of the whole call
+# between the phases in the sampled proportion; timing every keypress costs more than the loop
+STATS_SAMPLE_INTERVAL = 64
+
+# encrypt_into, and every NumPy path, works through pieces this long, so its scratch memory is
+# fixed however long the message is. The scratch
+# arrays are not kept on the machines but in a module-level pool: a call takes a set and gives
+# it back when done, so concurrent calls never share one, and at most SCRATCH_POOL_SIZE idle
+# sets are kept however many machines there are.
+INTO_CHUNK_SIZE = 1 << 16
+SCRATCH_POOL_SIZE = 2
+_scratch_pool = []
+
+def select_backend(length, rotor_count):
+    if length >= NUMPY_MIN_LENGTH + NUMPY_MIN_LENGTH_PER_ROTOR * rotor_count and load_numpy() is not None:
+        return 'numpy'
+    if length >= COMPILED_MIN_LENGTH + COMPILED_MIN_LENGTH_PER_ROTOR * rotor_count:
+        return 'compiled'
+    return 'table'
+
+def normalize_notch(notch, size=26):
+    # A notch is a single position, or a tuple of positions for a rotor that turns its neighbour
+    # over several times per revolution
+    if not hasattr(notch, '__iter__'):
+        return notch % size
+    notches = tuple(sorted({value % size for value in notch}))
+    return notches[0] if len(notches) == 1 else notches
+
+def turnover_table(notch, size=26):
+    # turnover_table(notch)[position] is True when stepping onto position carries to the next rotor
+    table = [False] * size
+    for position in notch if isinstance(notch, tuple) else (notch,):
+        table[position] = True
+    return table
+
+def count_carries(steps, position, notch, size=26):
+    # How many times a rotor starting at position lands on its notch within the given number of
+    # steps, i.e. how many steps it passes on to the next rotor. Works on ints and NumPy arrays.
+    if isinstance(notch, tuple):
+        # steps * 0 keeps the result an array of the right shape for a rotor without notches
+        return sum((count_carries(steps, position, single, size) for single in notch), steps * 0)
+    first = (notch - position - 1) % size + 1
+    return (steps + size - first) // size
+
+class Rotor:
+    def __init__(self, wiring, ring_setting=0):
+        self.wiring = wiring.upper()
+        self.ring_setting = ring_setting
+        self.position = 0
+        self.notch = 0  # Notch will be set by the user
+        self._tables = None
+        self._arrays = None
+
+    def set_position(self, position):
+        self.position = position % 26
+
+    def set_notch(self, notch):
+        self.notch = normalize_notch(notch)
+
+    def rotate(self):
+        self.position = (self.position + 1) % 26
+        if isinstance(self.notch, tuple):
+            return self.position in self.notch
+        return self.position == self.notch
+
+    def compile(self):
+        # Forward and inverse lookup tables for every rotor position, indexed by letter number
+        if self._tables is None:
+            key = (self.wiring, self.ring_setting)
+            tables = _cached_tables(_rotor_tables, key)
+            if tables is None:
+                wiring = [LETTER_INDEX[letter] for letter in self.wiring]
+                inverse = [self.wiring.index(letter) for letter in ALPHABET]
+                forward_tables = []
+                backward_tables = []
+                for position in range(26):
+                    shift = position - self.ring_setting
+                    forward_tables.append([(wiring[(index + shift) % 26] - shift) % 26 for index in range(26)])
+                    backward_tables.append([(inverse[(index + shift) % 26] - shift) % 26 for index in range(26)])
+                tables = _cache_tables(_rotor_tables, key, (forward_tables, backward_tables))
+            self._tables = tables
+        return self._tables
+
+    def compile_arrays(self):
+        # The same tables as [26, 26] uint8 NumPy arrays for the vectorized paths, shared the same way
+        if self._arrays is None:
+            key = (self.wiring, self.ring_setting)
+            arrays = _cached_tables(_rotor_arrays, key)
+            if arrays is None:
+                np = load_numpy()
+                forward_tables, backward_tables = self.compile()
+                arrays = _cache_tables(_rotor_arrays, key, (np.array(forward_tables, dtype=np.uint8),
+                                                            np.array(backward_tables, dtype=np.uint8)))
+            self._arrays = arrays
+        return self._arrays
+
+    # forward and backward work out the substitution from the wiring on every call, independently
+    # of the compiled tables, so the reference engine built on them can check those tables
+    def forward(self, letter):
+        index = (ALPHABET.index(letter) + self.position - self.ring_setting) % 26
+        letter = self.wiring[index]
+        return ALPHABET[(ALPHABET.index(letter) - self.position + self.ring_setting) % 26]
+
+    def backward(self, letter):
+        index = (ALPHABET.index(letter) + self.position - self.ring_setting) % 26
+        letter = ALPHABET[self.wiring.index(ALPHABET[index])]
+        return ALPHABET[(ALPHABET.index(letter) - self.position + self.ring_setting) % 26]
+
+class Reflector:
+    def __init__(self, wiring):
+        self.wiring = wiring.upper()
+        self._table = None
+
+    def compile(self):
+        if self._table is None:
+            self._table = [LETTER_INDEX[letter] for letter in self.wiring]
+        return self._table
+
+    def reflect(self, letter):
+        index = ALPHABET.index(letter)
+        return self.wiring[index]
+
+class Plugboard:
+    def __init__(self, wiring=None):
+        if wiring is None:
+            wiring = {}
+        self.wiring = {k.upper(): v.upper() for k, v in wiring.items()}
+        self._table = None
+
+    def compile(self):
+        if self._table is None:
+            self._table = [LETTER_INDEX[self.swap(letter)] for letter in ALPHABET]
+        return self._table
+
+    def swap(self, letter):
+        return self.wiring.get(letter, letter)
+
+class EnigmaMachine:
+    def __init__(self, rotors, reflector, plugboard, backend='auto'):
+        self.rotors = rotors
+        self.reflector = reflector
+        self.plugboard = plugboard
+
+        # 'auto' picks an engine per call from the message length and rotor count
+        self.backend = self._check_backend(backend)
+
+        # Keypresses are counted from the rotor positions the machine was built with
+        self.start_positions = [rotor.position for rotor in rotors]
+        self.steps = 0
+
+        # Instrumentation is off unless a MachineStats is attached
+        self.stats = None
+
+    def instrument(self, stats=None):
+        # with machine.instrument() as stats: ... collects statistics for the calls in the block
+        return Instrumentation(self, stats if stats is not None else MachineStats())
+
+    def _record_steps(self, start, end):
+        # Rotations and carry depths for keypresses start..end follow from the odometer rule, so
+        # they are counted arithmetically instead of inside the loops
+        stats = self.stats
+        stats.characters += end - start
+        count = len(self.rotors)
+        reached = [end - start]
+        for rotor, position in zip(self.rotors, self.start_positions):
+            start = count_carries(start, position, rotor.notch)
+            end = count_carries(end, position, rotor.notch)
+            reached.append(end - start)
+        reached[count] = 0  # A carry out of the last rotor moves nothing
+        stats.rotations += sum(reached)
+        for depth in range(1, count + 1):
+            moved = reached[depth - 1] - reached[depth]
+            if moved:
+                stats.carry_depths[depth] = stats.carry_depths.get(depth, 0) + moved
+
+    def _record_engine(self, engine, characters, started):
+        # The wall time of an instrumented call and the engine that actually ran it
+        stats = self.stats
+        stats.seconds += time.perf_counter() - started
+        stats.engines[engine] = stats.engines.get(engine, 0) + characters
+
+    def _sync_start_positions(self):
+        # The rotors' positions are the machine's state; start_positions and steps are only a
+        # description of it for the paths that compute positions arithmetically. Rotors set by
+        # hand since then (rotor.set_position to re-key) make their positions the new start.
+        steps = self.steps
+        if len(self.start_positions) == len(self.rotors):
+            for rotor, position in zip(self.rotors, self.start_positions):
+                if rotor.position != (position + steps) % 26:
+                    break
+                steps = count_carries(steps, position, rotor.notch)
+            else:
+                return
+        self.start_positions = [rotor.position for rotor in self.rotors]
+        self.steps = 0
+
+    def tell(self):
+        self._sync_start_positions()
+        return self.steps
+
+    def seek(self, steps):
+        if steps < 0:
+            raise ValueError("Cannot seek to a negative step")
+
+        self._sync_start_positions()
+        self.steps = steps
+
+        # Each rotor advances by the carries passed up from the rotor below it
+        for rotor, position in zip(self.rotors, self.start_positions):
+            rotor.position = (position + steps) % 26
+            steps = count_carries(steps, position, rotor.notch)
+
+    def configuration(self):
+        # Everything a step count is relative to, as plain picklable values: the wiring, ring
+        # setting and notch of every rotor, the start positions, the reflector and the plugboard.
+        # from_configuration builds a machine back from it.
+        self._sync_start_positions()
+        return (
+            tuple((rotor.wiring, rotor.ring_setting, rotor.notch) for rotor in self.rotors),
+            tuple(self.start_positions),
+            self.reflector.wiring,
+            tuple(sorted(self.plugboard.wiring.items())),
+        )
+
+    @classmethod
+    def from_configuration(cls, configuration, backend='auto'):
+        rotor_settings, start_positions, reflector, plugboard = configuration
+        rotors = []
+        for (wiring, ring_setting, notch), position in zip(rotor_settings, start_positions):
+            rotor = Rotor(wiring, ring_setting)
+            rotor.set_position(position)
+            rotor.set_notch(notch)
+            rotors.append(rotor)
+        return cls(rotors, Reflector(reflector), Plugboard(dict(plugboard)), backend)
+
+    def settings_hash(self):
+        # 8 bytes identifying the configuration
+        import hashlib
+        description = repr(self.configuration())
+        return hashlib.blake2b(description.encode('utf-8'), digest_size=8).digest()
+
+    def checkpoint(self, source_offset=None, destination_offset=None):
+        # The machine's state as a Checkpoint; checkpoint().to_bytes() is the compact blob. The
+        # offsets default to the step count, which is right for the byte-oriented modes.
+        return Checkpoint(
+            self.settings_hash(),
+            self.steps,
+            bytes(rotor.position for rotor in self.rotors),
+            self.steps if source_offset is None else source_offset,
+            self.steps if destination_offset is None else destination_offset,
+        )
+
+    def resume(self, checkpoint):
+        # Puts the machine back where a Checkpoint, or its blob, was taken and returns the
+        # Checkpoint. Fails if it was taken under other settings.
+        if not isinstance(checkpoint, Checkpoint):
+            checkpoint = Checkpoint.from_bytes(checkpoint)
+        if checkpoint.settings_hash != self.settings_hash():
+            raise ValueError("The checkpoint was taken with different machine settings")
+        self.seek(checkpoint.steps)
+        if bytes(rotor.position for rotor in self.rotors) != checkpoint.positions:
+            raise ValueError("The checkpoint's rotor positions do not match its step count")
+        return checkpoint
+
+    def decrypt_range(self, path, start, length):
+        # In the byte modes (encrypt_decrypt_bytes, encrypt_into, encrypt_decrypt_mmap) every
+        # byte is one keypress, so a byte offset is also the number of keypresses before it and
+        # the machine can jump straight there. The bytes are decrypted as raw bytes and returned
+        # decoded as latin-1, one character per byte; .encode('latin-1') gives them back.
+        with open(path, 'rb') as file:
+            file.seek(start)
+            ciphertext = file.read(length)
+        self.seek(start)
+        return self.encrypt_decrypt_bytes(ciphertext).decode('latin-1')
+
+    def _check_backend(self, backend):
+        if backend != 'auto' and backend not in BACKENDS:
+            raise ValueError(f"Unknown backend {backend!r}, expected 'auto' or one of {', '.join(BACKENDS)}")
+        if backend == 'numpy' and load_numpy() is None:
+            raise RuntimeError("NumPy is required for the numpy backend")
+        return backend
+
+    def _resolve_backend(self, backend, length):
+        backend = self.backend if backend is None else self._check_backend(backend)
+        if backend == 'auto':
+            return select_backend(length, len(self.rotors))
+        return backend
+
+    def encrypt_decrypt(self, message, preserve_case=False, backend=None):
+        self._sync_start_positions()
+        backend = self._resolve_backend(backend, len(message))
+        if preserve_case:
+            return self._encrypt_decrypt_preserving_case(message, backend)
+        return self._encrypt_decrypt_with(backend, message.upper())
+
+    def _encrypt_decrypt_with(self, backend, upper):
+        if backend == 'numpy':
+            return self._encrypt_decrypt_numpy_upper(upper)
+        if backend == 'reference':
+            return self._encrypt_decrypt_reference(upper)
+        if backend == 'compiled':
+            return self._encrypt_decrypt_compiled(upper)
+        return self._encrypt_decrypt_upper(upper)
+
+    def _encrypt_decrypt_preserving_case(self, message, backend='table'):
+        # Only ASCII letters go through the machine and each keeps its case; every other
+        # character is copied through unchanged. Nothing else is upper-cased, so each original
+        # character is exactly one keypress.
+        np = load_numpy()
+        if np is not None and backend == 'numpy':
+            return encrypt_text(message, self._encrypt_decrypt_cased_codes)
+
+        global _lower_runs, _non_letter_gaps
+        if _lower_runs is None:
+            import re
+            _lower_runs = re.compile('[a-z]+')
+            _non_letter_gaps = re.compile(f'[^A-Za-z]{{{NON_LETTER_SKIP_LENGTH},}}')
+        if backend == 'reference':
+            return self._encrypt_decrypt_cased_run(message, backend)
+
+        # Long runs of non-letters are not stepped through one by one: the machine seeks past
+        # each in one step. The reference engine still walks every character.
+        pieces = []
+        end = 0
+        for gap in _non_letter_gaps.finditer(message):
+            pieces.append(self._encrypt_decrypt_cased_run(message[end:gap.start()], backend))
+            pieces.append(gap.group())
+            started = self.steps
+            self.seek(started + gap.end() - gap.start())
+            if self.stats is not None:
+                self._record_steps(started, self.steps)
+            end = gap.end()
+        pieces.append(self._encrypt_decrypt_cased_run(message[end:], backend))
+        return ''.join(pieces)
+
+    def _encrypt_decrypt_cased_run(self, message, backend):
+        encrypted = self._encrypt_decrypt_with(backend, message.translate(ASCII_UPPER))
+
+        # Lower-case runs are found in bulk and lowered back slice by slice
+        pieces = []
+        end = 0
+        for run in _lower_runs.finditer(message):
+            pieces.append(encrypted[end:run.start()])
+            pieces.append(encrypted[run.start():run.end()].lower())
+            end = run.end()
+        pieces.append(encrypted[end:])
+        return ''.join(pieces)
+
+    def _encrypt_decrypt_cased_codes(self, codes):
+        # The class map is a pair of range tests over the whole array; numbers, whitespace and
+        # punctuation only cost those tests and the stepping arithmetic
+        is_lower = (codes >= ord('a')) & (codes <= ord('z'))
+        codes[is_lower] -= ord('a') - ord('A')
+        self._encrypt_decrypt_codes(codes)
+        codes[is_lower] += ord('a') - ord('A')
+
+    def _encrypt_decrypt_reference(self, upper):
+        # The original letter-by-letter walk through the components, kept as the plain statement
+        # of the machine that the faster engines are checked against. It uses none of the
+        # compiled tables, turnover tables or carry arithmetic.
+        first_step = self.steps
+        started = time.perf_counter()
+        encrypted_message = []
+
+        for letter in upper:
+            if letter in ALPHABET:
+                # Pass through the plugboard
+                letter = self.plugboard.swap(letter)
+
+                # Pass through the rotors forward
+                for rotor in self.rotors:
+                    letter = rotor.forward(letter)
+
+                # Pass through the reflector
+                letter = self.reflector.reflect(letter)
+
+                # Pass through the rotors backward
+                for rotor in reversed(self.rotors):
+                    letter = rotor.backward(letter)
+
+                # Pass through the plugboard again
+                letter = self.plugboard.swap(letter)
+                if self.stats is not None:
+                    self.stats.letters += 1
+            # Numbers and special characters are unchanged
+            encrypted_message.append(letter)
+
+            # Rotate the rotors
+            rotate_next = True
+            for rotor in self.rotors:
+                if not rotate_next:
+                    break
+                rotate_next = rotor.rotate()
+
+        self.steps += len(upper)
+        if self.stats is not None:
+            self._record_steps(first_step, self.steps)
+            self._record_engine('reference', len(upper), started)
+        return ''.join(encrypted_message)
+
+    def _encrypt_decrypt_compiled(self, upper):
+        # A function generated for this configuration, see specialize.py. Instrumented calls
+        # still run it and are counted around it: the steps arithmetically and the whole call
+        # timed, with no split into phases.
+        from .specialize import specialize
+        started = time.perf_counter()
+        encrypted, positions = specialize(self)(upper, [rotor.position for rotor in self.rotors])
+        for rotor, position in zip(self.rotors, positions):
+            rotor.position = position
+        if self.stats is not None:
+            self.stats.letters += _count_letters(upper)
+            self._record_steps(self.steps, self.steps + len(upper))
+            self._record_engine('compiled', len(upper), started)
+        self.steps += len(upper)
+        return encrypted
+
+    def _encrypt_decrypt_upper(self, upper):
+        if self.stats is not None:
+            return self._encrypt_decrypt_instrumented(upper)
+
+        encrypted_message = []
+
+        # Letters are handled as numbers 0-25 between the plugboard passes.
+        # composites[k] is the combined substitution of rotor k, every rotor above it and the
+        # reflector. Upper rotors only move when a carry reaches them, so composites[1] is kept
+        # and rebuilt from the highest still valid level only after such a carry.
+        plugboard, forward_tables, backward_tables, positions, turnovers, composites = self._table_setup()
+        count = len(self.rotors)
+        valid_from = count
+        lower = min(count, 1)
+        advance = _ADVANCE
+        turnover = turnovers[0] if count else None
+
+        for letter in upper:
+            code = LETTER_INDEX.get(letter)
+            if code is not None:
+                if valid_from > lower:
+                    _rebuild_composites(composites, forward_tables, backward_tables, positions, valid_from, lower)
+                    valid_from = lower
+
+                # Pass through the plugboard
+                code = plugboard[code]
+
+                # Pass through the moving rotor, the cached upper stack and back
+                if lower:
+                    position = positions[0]
+                    code = backward_tables[0][position][composites[1][forward_tables[0][position][code]]]
+                else:
+                    code = composites[0][code]
+
+                # Pass through the plugboard again
+                letter = ALPHABET[plugboard[code]]
+            # Numbers and special characters are unchanged
+            encrypted_message.append(letter)
+
+            # Rotate the rotors. Only the first one moves on every keypress; the rotors above it are
+            # only touched when the turnover table says a carry reaches them.
+            if count:
+                positions[0] = position = advance[positions[0]]
+                if turnover[position]:
+                    valid_from = max(valid_from, _carry(positions, turnovers))
+
+        self._table_finish(positions, len(upper))
+        return ''.join(encrypted_message)
+
+    def _encrypt_decrypt_instrumented(self, upper):
+        # The loop of _encrypt_decrypt_upper with the cached upper stack counted and one keypress
+        # in STATS_SAMPLE_INTERVAL timed phase by phase. The whole call is timed and split
+        # between substitution and stepping in the sampled proportion. Kept separate so the plain
+        # loop pays nothing for it.
+        stats = self.stats
+        clock = time.perf_counter
+        call_started = clock()
+        substitution = stepping = 0.0
+        misses = 0
+        interval = STATS_SAMPLE_INTERVAL
+        countdown = 1
+        encrypted_message = []
+
+        plugboard, forward_tables, backward_tables, positions, turnovers, composites = self._table_setup()
+        count = len(self.rotors)
+        valid_from = count
+        lower = min(count, 1)
+        advance = _ADVANCE
+        turnover = turnovers[0] if count else None
+
+        for letter in upper:
+            countdown -= 1
+            if not countdown:
+                countdown = interval
+                started = clock()
+            code = LETTER_INDEX.get(letter)
+            if code is not None:
+                if valid_from > lower:
+                    misses += 1
+                    _rebuild_composites(composites, forward_tables, backward_tables, positions, valid_from, lower)
+                    valid_from = lower
+
+                code = plugboard[code]
+                if lower:
+                    position = positions[0]
+                    code = backward_tables[0][position][composites[1][forward_tables[0][position][code]]]
+                else:
+                    code = composites[0][code]
+                letter = ALPHABET[plugboard[code]]
+            encrypted_message.append(letter)
+            if countdown == interval:
+                substituted = clock()
+
+            if count:
+                positions[0] = position = advance[positions[0]]
+                if turnover[position]:
+                    valid_from = max(valid_from, _carry(positions, turnovers))
+            if countdown == interval:
+                stepped = clock()
+                substitution += substituted - started
+                stepping += stepped - substituted
+
+        letters = _count_letters(upper)
+        stats.letters += letters
+        stats.cache_hits += letters - misses
+        stats.cache_misses += misses
+        self._record_steps(self.steps, self.steps + len(upper))
+        self._table_finish(positions, len(upper))
+
+        elapsed = clock() - call_started
+        share = substitution / (substitution + stepping) if substitution + stepping else 1.0
+        stats.substitution_seconds += elapsed * share
+        stats.stepping_seconds += elapsed * (1 - share)
+        self._record_engine('table', len(upper), call_started)
+        return ''.join(encrypted_message)
+
+    def _table_setup(self):
+        # Plugboard, rotor tables, current positions, turnover tables and the composite cache
+        # (empty but for the reflector) for the table loops
+        count = len(self.rotors)
+        return (
+            self.plugboard.compile(),
+            [rotor.compile()[0] for rotor in self.rotors],
+            [rotor.compile()[1] for rotor in self.rotors],
+            [rotor.position for rotor in self.rotors],
+            [turnover_table(rotor.notch) for rotor in self.rotors],
+            [None] * count + [self.reflector.compile()],
+        )
+
+    def _table_finish(self, positions, length):
+        for rotor, position in zip(self.rotors, positions):
+            rotor.position = position
+        self.steps += length
+
+    def encrypt_decrypt_stream(self, source, chunk_size=65536, resume=None):
+        # source is a file-like object or any iterable of strings or bytes. Rotor positions carry
+        # over from one chunk to the next and only one chunk is held in memory at a time. Bytes
+        # chunks are handled as by encrypt_decrypt_bytes and come out as bytes.
+        #
+        # Chunks are read lazily, so after a chunk has been handled, source.tell() is where the
+        # next one starts and machine.checkpoint(source.tell(), ...) records the boundary. With
+        # resume set to such a checkpoint, the machine is restored and a seekable source moved
+        # to the checkpoint's source offset; any other iterable must already start there.
+        if resume is not None:
+            checkpoint = self.resume(resume)
+            if hasattr(source, 'seek'):
+                source.seek(checkpoint.source_offset)
+        if hasattr(source, 'read'):
+            file = source
+            # A text file returns '' at the end and a binary one b''
+            source = iter(lambda: file.read(chunk_size) or None, None)
+        for chunk in source:
+            if isinstance(chunk, (bytes, bytearray, memoryview)):
+                if chunk:
+                    yield self.encrypt_decrypt_bytes(chunk)
+            elif isinstance(chunk, str):
+                if chunk:
+                    yield self.encrypt_decrypt(chunk)
+            else:
+                raise TypeError(f"Expected str or bytes chunks, got {type(chunk).__name__}")
+
+    def encrypt_decrypt_file(self, source, destination, chunk_size=65536, resume=None, on_checkpoint=None):
+        # on_checkpoint, if given, is called with a checkpoint blob after every chunk has been
+        # written and flushed. To resume, pass the last blob as resume and the destination
+        # opened for update ('r+'): it is cut back to the checkpoint and the job continues from
+        # there.
+        if resume is not None:
+            resume = self.resume(resume)
+            destination.seek(resume.destination_offset)
+            destination.truncate()
+        for chunk in self.encrypt_decrypt_stream(source, chunk_size, resume):
+            destination.write(chunk)
+            if on_checkpoint is not None:
+                destination.flush()
+                source_offset = source.tell() if hasattr(source, 'tell') else None
+                on_checkpoint(self.checkpoint(source_offset, destination.tell()).to_bytes())
+
+    def parallel_encrypt(self, message, workers=None):
+        # Each output character only depends on the settings and its keypress number, so the
+        # message is split into one segment per worker and every worker builds the machine from
+        # its configuration and seeks to the start of its segment. Statistics collected by the
+        # workers are added to the attached MachineStats, if any.
+        workers = workers or os.cpu_count() or 1
+        first_step = self.tell()
+        upper = message.upper()
+        segment = -(-len(upper) // workers) or 1
+        starts = range(0, len(upper), segment)
+
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(
+                _encrypt_segment,
+                [self._worker_arguments(first_step + start) for start in starts],
+                [upper[start:start + segment] for start in starts],
+            ))
+
+        for _, stats in results:
+            self._merge_stats(stats)
+        self.seek(first_step + len(upper))
+        return ''.join(encrypted for encrypted, _ in results)
+
+    def parallel_encrypt_file(self, source_path, destination_path, workers=None, chunk_size=1 << 22):
+        # As parallel_encrypt, for a file processed as raw bytes (see encrypt_decrypt_bytes).
+        # Every worker writes its segment of the destination in place. Returns the size.
+        workers = workers or os.cpu_count() or 1
+        first_step = self.tell()
+        size = os.path.getsize(source_path)
+        with open(destination_path, 'wb') as destination:
+            destination.truncate(size)
+        segment = -(-size // workers) or 1
+
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(_encrypt_file_segment, self._worker_arguments(first_step + start), source_path,
+                                destination_path, start, min(start + segment, size), chunk_size)
+                for start in range(0, size, segment)
+            ]
+            for future in futures:
+                self._merge_stats(future.result())
+
+        self.seek(first_step + size)
+        return size
+
+    def _worker_arguments(self, steps):
+        # Only the configuration is sent to a worker, never the machine with its scratch arrays
+        return self.configuration(), self.backend, steps, self.stats is not None
+
+    def _merge_stats(self, stats):
+        if stats is not None and self.stats is not None:
+            self.stats.merge(stats)
+
+    def encrypt_decrypt_numpy(self, message):
+        return self.encrypt_decrypt(message, backend='numpy')
+
+    def _encrypt_decrypt_numpy_upper(self, upper):
+        return encrypt_text(upper, self._encrypt_decrypt_codes)
+
+    def _encrypt_decrypt_codes(self, codes):
+        started = time.perf_counter()
+        encrypt_codes(codes, self.rotors, self.start_positions, self.steps, self.reflector, self.plugboard, self.stats)
+        if self.stats is not None:
+            self._record_steps(self.steps, self.steps + len(codes))
+            self._record_engine('numpy', len(codes), started)
+
+        # Leave the rotors where the per-character loop would have left them
+        self.seek(self.steps + len(codes))
+
+    def encrypt_decrypt_bytes(self, data, preserve_case=False):
+        # ASCII letters are encrypted, every other byte passes through unchanged and, like any
+        # other character, steps the rotors
+        self._sync_start_positions()
+        np = load_numpy()
+        if preserve_case:
+            if np is None:
+                return self._encrypt_decrypt_preserving_case(bytes(data).decode('latin-1')).encode('latin-1')
+            codes = np.frombuffer(bytes(data), dtype=np.uint8).copy()
+            self._encrypt_decrypt_cased_codes(codes)
+            return codes.tobytes()
+
+        data = bytes(data).upper()
+        if np is None:
+            return self._encrypt_decrypt_upper(data.decode('latin-1')).encode('latin-1')
+        codes = np.frombuffer(data, dtype=np.uint8).copy()
+        self._encrypt_decrypt_codes(codes)
+        return codes.tobytes()
+
+    def encrypt_into(self, source, destination, preserve_case=False):
+        # Encrypts the bytes of any buffer (bytes, bytearray, memoryview, mmap, uint8 array) into
+        # the writable buffer destination, which may be the source itself, and returns the number
+        # of bytes processed. Bytes are treated as by encrypt_decrypt_bytes. The NumPy path works
+        # through pooled scratch arrays, so once the pool is filled nothing is allocated in
+        # proportion to the input.
+        source = memoryview(source).cast('B')
+        destination = memoryview(destination).cast('B')
+        length = len(source)
+        if destination.readonly:
+            raise ValueError("The destination buffer must be writable")
+        if len(destination) < length:
+            raise ValueError(f"The destination buffer holds {len(destination)} bytes, {length} are needed")
+
+        self._sync_start_positions()
+        np = load_numpy()
+        if np is None:
+            # Without NumPy the bytes go through encrypt_decrypt_bytes one bounded chunk at a time
+            for start in range(0, length, INTO_CHUNK_SIZE):
+                end = min(start + INTO_CHUNK_SIZE, length)
+                destination[start:end] = self.encrypt_decrypt_bytes(source[start:end], preserve_case)
+            return length
+
+        source = np.frombuffer(source, dtype=np.uint8)
+        destination = np.frombuffer(destination, dtype=np.uint8)
+        scratch = _take_scratch()
+        try:
+            for start in range(0, length, INTO_CHUNK_SIZE):
+                end = min(start + INTO_CHUNK_SIZE, length)
+                self._encrypt_into_chunk(source[start:end], destination[start:end], preserve_case, scratch)
+        finally:
+            _return_scratch(scratch)
+        return length
+
+    def _encrypt_into_chunk(self, source, destination, preserve_case, scratch):
+        # Every operation writes into a slice of the scratch arrays
+        np = load_numpy()
+        size = len(source)
+        code = scratch['code'][:size]
+        is_letter = scratch['is_letter'][:size]
+        steps = scratch['steps'][:size]
+        term = scratch['term'][:size]
+        started = time.perf_counter()
+
+        # Letter numbers, with 255 marking every other byte. Those are clamped to a valid index
+        # and their results discarded at the end.
+        np.copyto(term, source)
+        np.take(scratch['codes'], term, out=code, mode='clip')
+        np.not_equal(code, 255, out=is_letter)
+        np.minimum(code, 25, out=code)
+        if preserve_case:
+            is_lower = scratch['is_lower'][:size]
+            np.greater_equal(source, ord('a'), out=is_lower)
+            np.logical_and(is_lower, is_letter, out=is_lower)
+
+        np.add(scratch['offsets'][:size], self.steps, out=steps)
+        moving, composite = _stack_tables(self.rotors, self.start_positions, self.reflector, steps,
+                                          scratch['offsets_by_level'], scratch['carries'][:size], term,
+                                          INTO_CHUNK_SIZE)
+        scratch['composite'][:] = composite
+        scratch['plugboard'][:] = self.plugboard.compile()
+        stepped = time.perf_counter()
+
+        _substitute(code, self.rotors, moving, scratch['offsets_by_level'], scratch['composite'],
+                    scratch['plugboard'], term)
+        np.add(code, ord('A'), out=code)
+
+        # Non-letters pass through; the source is fully read by now, so it may be the destination
+        np.copyto(destination, source)
+        np.copyto(destination, code, where=is_letter)
+        if preserve_case:
+            np.add(destination, ord('a') - ord('A'), out=destination, where=is_lower)
+
+        if self.stats is not None:
+            self.stats.stepping_seconds += stepped - started
+            self.stats.substitution_seconds += time.perf_counter() - stepped
+            self.stats.letters += int(np.count_nonzero(is_letter))
+            self._record_steps(self.steps, self.steps + size)
+            self._record_engine('numpy', size, started)
+        self.seek(self.steps + size)
+
+    def encrypt_decrypt_mmap(self, source_path, destination_path, chunk_size=1 << 22, resume=None,
+                             on_checkpoint=None):
+        # File to file on raw bytes: the input is mapped read-only, the output is sized up front
+        # and each chunk is encrypted straight from one mapping into the other. on_checkpoint
+        # and resume work as for encrypt_decrypt_file; when resuming, the output written before
+        # the checkpoint is kept and the job continues at its offset.
+        start = 0
+        mode = 'w+b'
+        if resume is not None:
+            start = self.resume(resume).source_offset
+            mode = 'r+b'
+        with open(source_path, 'rb') as source, open(destination_path, mode) as destination:
+            size = os.fstat(source.fileno()).st_size
+            destination.truncate(size)
+            if start >= size:
+                return size
+            with mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) as source_map, \
+                    mmap.mmap(destination.fileno(), size) as destination_map:
+                with memoryview(source_map) as source_view, memoryview(destination_map) as destination_view:
+                    for start in range(start, size, chunk_size):
+                        end = min(start + chunk_size, size)
+                        self.encrypt_into(source_view[start:end], destination_view[start:end])
+                        if on_checkpoint is not None:
+                            destination_map.flush()
+                            on_checkpoint(self.checkpoint(end, end).to_bytes())
+        return size
+
+def _count_letters(upper):
+    # One str.count pass per letter is much faster than testing every character
+    return sum(upper.count(letter) for letter in ALPHABET)
+
+# advance[position] is the next position of a rotor
+_ADVANCE = list(range(1, 26)) + [0]
+
+def _rebuild_composites(composites, forward_tables, backward_tables, positions, valid_from, lower):
+    # Recomputes composites[lower:valid_from], the levels below the highest one still valid
+    for index in range(valid_from - 1, lower - 1, -1):
+        forward = forward_tables[index][positions[index]]
+        backward = backward_tables[index][positions[index]]
+        inner = composites[index + 1]
+        composites[index] = [backward[inner[forward[value]]] for value in range(26)]
+
+def _carry(positions, turnovers):
+    # The first rotor has just turned over: moves the rotors above it as far as the carry goes and
+    # returns the lowest composite level still valid afterwards
+    count = len(positions)
+    index = 1
+    while index < count:
+        positions[index] = position = _ADVANCE[positions[index]]
+        if not turnovers[index][position]:
+            break
+        index += 1
+    return min(index + 1, count)
+
+def encrypt_text(text, encrypt):
+    # Runs encrypt, which works in place on a uint32 array of character codes, over text one
+    # INTO_CHUNK_SIZE piece at a time, so the arrays never grow with the text
+    np = load_numpy()
+    pieces = []
+    for start in range(0, len(text), INTO_CHUNK_SIZE):
+        codes = np.frombuffer(text[start:start + INTO_CHUNK_SIZE].encode('utf-32-le'), dtype=np.uint32).copy()
+        encrypt(codes)
+        pieces.append(codes.tobytes().decode('utf-32-le'))
+    return ''.join(pieces)
+
+def encrypt_codes(codes, rotors, start_positions, steps, reflector, plugboard, stats=None):
+    # Encrypts an array of upper-cased character codes in place, starting steps keypresses after
+    # start_positions. Only the tables and notches of the rotors are used, never their current
+    # positions, so the same components can serve any number of callers at once. Every
+    # character, including numbers and special characters, steps the rotors, so the number of
+    # steps taken before a letter is its index in the array. Long arrays are worked through in
+    # INTO_CHUNK_SIZE pieces, which bounds the work arrays.
+    for start in range(0, len(codes), INTO_CHUNK_SIZE):
+        _encrypt_codes_chunk(codes[start:start + INTO_CHUNK_SIZE], rotors, start_positions, steps + start, reflector,
+                             plugboard, stats)
+
+def _encrypt_codes_chunk(codes, rotors, start_positions, steps, reflector, plugboard, stats):
+    np = load_numpy()
+    started = time.perf_counter()
+    is_letter = (codes >= ord('A')) & (codes <= ord('Z'))
+    letter_steps = np.flatnonzero(is_letter)
+    np.add(letter_steps, steps, out=letter_steps)
+    stepped = started
+
+    if len(letter_steps):
+        term = np.empty(len(letter_steps), dtype=np.intp)
+        offsets_by_level = []
+        moving, composite = _stack_tables(rotors, start_positions, reflector, letter_steps, offsets_by_level,
+                                          np.empty(len(letter_steps), dtype=np.intp), term)
+        stepped = time.perf_counter()
+
+        code = (codes[is_letter] - ord('A')).astype(np.uint8)
+        _substitute(code, rotors, moving, offsets_by_level, np.array(composite, dtype=np.uint8),
+                    np.array(plugboard.compile(), dtype=np.uint8), term)
+        codes[is_letter] = code + ord('A')
+
+    if stats is not None:
+        # Computing the positions is the stepping phase, the gathers are the substitution
+        stats.stepping_seconds += stepped - started
+        stats.substitution_seconds += time.perf_counter() - stepped
+        stats.letters += int(np.count_nonzero(is_letter))
+
+def _stack_tables(rotors, start_positions, reflector, steps, offsets_by_level, carries, term, capacity=None):
+    # The rotor positions for every keypress number in steps, an intp array that is used up, as
+    # by the odometer rule of Rotor.rotate: level by level, steps becomes count_carries(steps,
+    # ...). Every rotor that moves gets a row in offsets_by_level, added on demand with room for
+    # capacity keypresses, holding position * 26, its offset into the flat [position, letter]
+    # tables. The rotors above the moving ones stay put and are folded into a single table
+    # together with the reflector. carries and term are intp work arrays as long as steps.
+    # Returns the number of moving rotors and the folded table.
+    np = load_numpy()
+    size = len(steps)
+    moving = 0
+    for rotor, position in zip(rotors, start_positions):
+        if steps[0] == steps[-1]:
+            break
+        if moving == len(offsets_by_level):
+            offsets_by_level.append(np.empty(capacity or size, dtype=np.intp))
+        offsets = offsets_by_level[moving][:size]
+        np.add(steps, position, out=offsets)
+        np.remainder(offsets, 26, out=offsets)
+        np.multiply(offsets, 26, out=offsets)
+        moving += 1
+
+        carries.fill(0)
+        for notch in rotor.notch if isinstance(rotor.notch, tuple) else (rotor.notch,):
+            first = (notch - position - 1) % 26 + 1
+            np.add(steps, 26 - first, out=term)
+            np.floor_divide(term, 26, out=term)
+            np.add(carries, term, out=carries)
+        steps, carries = carries, steps
+
+    stationary = []
+    rotor_steps = int(steps[0])
+    for rotor, position in zip(rotors[moving:], start_positions[moving:]):
+        stationary.append((rotor, (position + rotor_steps) % 26))
+        rotor_steps = count_carries(rotor_steps, position, rotor.notch)
+    composite = reflector.compile()
+    for rotor, position in reversed(stationary):
+        forward = rotor.compile()[0][position]
+        backward = rotor.compile()[1][position]
+        composite = [backward[composite[forward[value]]] for value in range(26)]
+    return moving, composite
+
+def _substitute(code, rotors, moving, offsets_by_level, composite, plugboard, term):
+    # Sends the letter numbers in code, a uint8 array, through the plugboard, the moving rotors,
+    # the folded table and back, in place. composite and plugboard are uint8 arrays of 26 and
+    # term an intp work array as long as code. Gathers index with intp arrays and clip mode, so
+    # NumPy needs no temporary copies.
+    np = load_numpy()
+    size = len(code)
+    np.copyto(term, code)
+    np.take(plugboard, term, out=code, mode='clip')
+    for level in range(moving):
+        np.copyto(term, code)
+        np.add(term, offsets_by_level[level][:size], out=term)
+        np.take(rotors[level].compile_arrays()[0].reshape(-1), term, out=code, mode='clip')
+    np.copyto(term, code)
+    np.take(composite, term, out=code, mode='clip')
+    for level in range(moving - 1, -1, -1):
+        np.copyto(term, code)
+        np.add(term, offsets_by_level[level][:size], out=term)
+        np.take(rotors[level].compile_arrays()[1].reshape(-1), term, out=code, mode='clip')
+    np.copyto(term, code)
+    np.take(plugboard, term, out=code, mode='clip')
+
+def _take_scratch():
+    try:
+        return _scratch_pool.pop()
+    except IndexError:
+        pass
+    np = load_numpy()
+    codes = np.full(256, 255, dtype=np.uint8)
+    codes[ord('A'):ord('Z') + 1] = codes[ord('a'):ord('z') + 1] = np.arange(26)
+    return {
+        'codes': codes,
+        'offsets': np.arange(INTO_CHUNK_SIZE, dtype=np.intp),
+        'code': np.empty(INTO_CHUNK_SIZE, dtype=np.uint8),
+        'is_letter': np.empty(INTO_CHUNK_SIZE, dtype=bool),
+        'is_lower': np.empty(INTO_CHUNK_SIZE, dtype=bool),
+        'steps': np.empty(INTO_CHUNK_SIZE, dtype=np.intp),
+        'carries': np.empty(INTO_CHUNK_SIZE, dtype=np.intp),
+        'term': np.empty(INTO_CHUNK_SIZE, dtype=np.intp),
+        'plugboard': np.empty(26, dtype=np.uint8),
+        'composite': np.empty(26, dtype=np.uint8),
+        # One row of table offsets per rotor that moves within a chunk, grown on demand
+        'offsets_by_level': [],
+    }
+
+def _return_scratch(scratch):
+    if len(_scratch_pool) < SCRATCH_POOL_SIZE:
+        _scratch_pool.append(scratch)
+
+def _worker_machine(configuration, backend, steps, instrumented):
+    machine = EnigmaMachine.from_configuration(configuration, backend)
+    if instrumented:
+        machine.stats = MachineStats()
+    machine.seek(steps)
+    return machine
+
+def _encrypt_segment(arguments, upper):
+    machine = _worker_machine(*arguments)
+    return machine.encrypt_decrypt(upper), machine.stats
+
+def _encrypt_file_segment(arguments, source_path, destination_path, start, end, chunk_size):
+    machine = _worker_machine(*arguments)
+    with open(source_path, 'rb') as source, open(destination_path, 'r+b') as destination:
+        source.seek(start)
+        while start < end:
+            chunk = machine.encrypt_decrypt_bytes(source.read(min(chunk_size, end - start)))
+            os.pwrite(destination.fileno(), chunk, start)
+            start += len(chunk)
+    return machine.stats
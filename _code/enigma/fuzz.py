@@ -0,0 +1,292 @@
+# Differential fuzzing of the encryption engines. Random configurations and messages go through
+# the reference engine and through every fast engine; any disagreement is shrunk to a minimal
+# case before it is reported. Run with: python -m enigma.fuzz --cases 1000
+import argparse
+import random
+import sys
+from collections import namedtuple
+
+from .alphabet import ByteEnigmaMachine
+from .bank import MachineBank
+from .batch import encrypt_decrypt_batch
+from .catalog import ROTORS
+from .core import ALPHABET, DEFAULT_REFLECTOR, EnigmaMachine, Plugboard, Reflector, Rotor, load_numpy
+from .key import CompiledKey
+from .keystream import KeystreamTable
+from .settings import MachineCache, make_settings
+
+# Settings has no ring settings, so they are kept next to it; engines that only take Settings
+# skip cases where any of them is set
+Case = namedtuple('Case', ['settings', 'ring_settings', 'message'])
+
+NON_LETTERS = " .,;:!?'-\n\t0123456789"
+NON_ASCII = "ßéÄöü€ﬁ"
+
+_machines = MachineCache()
+
+def build_machine(case, backend='auto'):
+    # Built from the components directly rather than through MachineCache, which has no ring
+    # settings
+    settings = case.settings
+    rotors = []
+    for wiring, ring_setting, position, notch in zip(settings.rotors, case.ring_settings, settings.positions,
+                                                     settings.notches):
+        rotor = Rotor(wiring, ring_setting)
+        rotor.set_position(position)
+        rotor.set_notch(notch)
+        rotors.append(rotor)
+    return EnigmaMachine(rotors, Reflector(settings.reflector), Plugboard(dict(settings.plugboard)), backend)
+
+def _has_rings(case):
+    return any(case.ring_settings)
+
+def random_reflector(rng):
+    letters = rng.sample(ALPHABET, 26)
+    wiring = dict(zip(letters[::2], letters[1::2]))
+    wiring.update(zip(letters[1::2], letters[::2]))
+    return ''.join(wiring[letter] for letter in ALPHABET)
+
+def random_case(rng, max_rotors=12, max_length=2000):
+    numbers = rng.sample(sorted(ROTORS, key=int), rng.randint(0, max_rotors))
+    notches = []
+    for _ in numbers:
+        if rng.random() < 0.2:
+            notches.append(tuple(rng.sample(range(26), rng.randint(2, 4))))
+        else:
+            notches.append(rng.randrange(26))
+
+    letters = rng.sample(ALPHABET, rng.randint(0, 13) * 2)
+    plugboard = dict(zip(letters[::2], letters[1::2]))
+    plugboard.update(zip(letters[1::2], letters[::2]))
+    reflector = random_reflector(rng) if rng.random() < 0.3 else DEFAULT_REFLECTOR
+    settings = make_settings([ROTORS[number] for number in numbers], [rng.randrange(26) for _ in numbers],
+                             notches, reflector, plugboard)
+    ring_settings = tuple(rng.randrange(26) if rng.random() < 0.5 else 0 for _ in numbers)
+
+    # Lengths on both sides of the NumPy threshold and text that is often mostly non-letters
+    length = rng.choice([0, 1, rng.randint(2, 64), rng.randint(0, max_length)])
+    non_letter_ratio = rng.choice([0.0, 0.1, 0.5, 0.9, 1.0])
+    others = NON_LETTERS + NON_ASCII if rng.random() < 0.3 else NON_LETTERS
+    message = ''.join(rng.choice(others) if rng.random() < non_letter_ratio else rng.choice(ALPHABET + ALPHABET.lower())
+                      for _ in range(length))
+    return Case(settings, ring_settings, message)
+
+def _cache(case):
+    if _has_rings(case):
+        return None
+    return _machines.machine(case.settings).encrypt_decrypt(case.message)
+
+def _split(case):
+    # The message in three pieces, so positions have to carry over between calls
+    upper = case.message.upper()
+    first, second = len(upper) // 3, 2 * len(upper) // 3
+    return ''.join(build_machine(case).encrypt_decrypt_stream([upper[:first], upper[first:second], upper[second:]]))
+
+def _seek(case):
+    upper = case.message.upper()
+    middle = len(upper) // 2
+    tail = build_machine(case)
+    tail.seek(middle)
+    return build_machine(case).encrypt_decrypt(upper[:middle]) + tail.encrypt_decrypt(upper[middle:])
+
+def _bytes(case, preserve_case=False):
+    if not case.message.isascii():
+        return None
+    return build_machine(case).encrypt_decrypt_bytes(case.message.encode('ascii'), preserve_case).decode('ascii')
+
+def _into(case, preserve_case=False):
+    # In place, through a memoryview, in two calls
+    if not case.message.isascii():
+        return None
+    data = bytearray(case.message.encode('ascii'))
+    middle = len(data) // 2
+    machine = build_machine(case)
+    machine.encrypt_into(data[:middle], memoryview(data)[:middle], preserve_case)
+    machine.encrypt_into(memoryview(data)[middle:], memoryview(data)[middle:], preserve_case)
+    return data.decode('ascii')
+
+def _key(case):
+    # Twice through the same key, the second time in two pieces with a state carried over
+    key = CompiledKey(build_machine(case))
+    first = key.encrypt_decrypt(case.message)
+    upper = case.message.upper()
+    state = key.state()
+    second = key.encrypt_decrypt(upper[:len(upper) // 2], state) + key.encrypt_decrypt(upper[len(upper) // 2:], state)
+    return first if first == second else (first, second)
+
+def _byte_machine(case):
+    settings, message = case.settings, case.message
+    if not message.isascii() or _has_rings(case):
+        return None
+    rotors = [(wiring.encode('ascii'), position, notch)
+              for wiring, position, notch in zip(settings.rotors, settings.positions, settings.notches)]
+    byte_machine = ByteEnigmaMachine(ALPHABET.encode('ascii'), rotors, settings.reflector.encode('ascii'),
+                                     {key.encode('ascii'): value.encode('ascii') for key, value in settings.plugboard})
+    return byte_machine.encrypt_decrypt(message.upper().encode('ascii')).decode('ascii')
+
+def _bank(case):
+    # The case's machine in a bank next to copies at other positions with other stack heights
+    settings, message = case.settings, case.message
+    if not message.isascii() or _has_rings(case):
+        return None
+    others = [settings._replace(rotors=settings.rotors[:level], positions=tuple((position + 7) % 26 for position in
+                                                                                settings.positions[:level]),
+                                notches=settings.notches[:level])
+              for level in range(len(settings.rotors))]
+    return MachineBank([settings] + others).encrypt_decrypt(message.encode('ascii'))[0].tobytes().decode('ascii')
+
+def _keystream(case):
+    upper = case.message.upper()
+    return KeystreamTable(build_machine(case), max(len(upper), 1)).encrypt_decrypt(upper)
+
+def _batch(case):
+    settings, message = case.settings, case.message
+    if _has_rings(case):
+        return None
+    (result, error), = encrypt_decrypt_batch([({
+        'rotors': settings.rotors,
+        'positions': settings.positions,
+        'notches': settings.notches,
+        'reflector': settings.reflector,
+        'plugboard': dict(settings.plugboard),
+    }, message)])
+    if error is not None:
+        raise error
+    return result
+
+# name -> (preserve_case, needs NumPy, engine). An engine returns the output for a case, or None
+# when the case is outside what it supports. Its output is compared with the reference engine run
+# in the same case mode.
+ENGINES = {
+    'table': (False, False, lambda case: build_machine(case, 'table').encrypt_decrypt(case.message)),
+    'compiled': (False, False, lambda case: build_machine(case, 'compiled').encrypt_decrypt(case.message)),
+    'numpy': (False, True, lambda case: build_machine(case, 'numpy').encrypt_decrypt(case.message)),
+    'auto': (False, False, lambda case: build_machine(case).encrypt_decrypt(case.message)),
+    'cache': (False, False, _cache),
+    'split': (False, False, _split),
+    'seek': (False, False, _seek),
+    'bytes': (False, False, _bytes),
+    'into': (False, False, _into),
+    'key': (False, False, _key),
+    'byte_machine': (False, False, _byte_machine),
+    'bank': (False, True, _bank),
+    'keystream': (False, True, _keystream),
+    'batch': (False, True, _batch),
+    'table_cased': (True, False, lambda case: build_machine(case, 'table').encrypt_decrypt(case.message, True)),
+    'compiled_cased': (True, False, lambda case: build_machine(case, 'compiled').encrypt_decrypt(case.message, True)),
+    'numpy_cased': (True, True, lambda case: build_machine(case, 'numpy').encrypt_decrypt(case.message, True)),
+    'bytes_cased': (True, False, lambda case: _bytes(case, True)),
+    'into_cased': (True, False, lambda case: _into(case, True)),
+}
+
+def available_engines():
+    numpy = load_numpy() is not None
+    return [name for name, (_, needs_numpy, _) in ENGINES.items() if numpy or not needs_numpy]
+
+def check_case(case, engines=None):
+    # Returns (engine, expected, got) for every engine that disagrees with the reference. An
+    # engine raising counts as a disagreement, with the exception in place of its output.
+    expected = {}
+    mismatches = []
+    for name in engines or available_engines():
+        preserve_case, _, engine = ENGINES[name]
+        if preserve_case not in expected:
+            expected[preserve_case] = build_machine(case, 'reference').encrypt_decrypt(case.message, preserve_case)
+        try:
+            got = engine(case)
+        except Exception as error:
+            got = error
+        if got is not None and got != expected[preserve_case]:
+            mismatches.append((name, expected[preserve_case], got))
+    return mismatches
+
+def _smaller_cases(case):
+    # Candidate simplifications, roughly from the biggest cut to the smallest
+    settings, ring_settings, message = case
+    size = len(message)
+    while size:
+        for start in range(0, len(message), size):
+            yield case._replace(message=message[:start] + message[start + size:])
+        size //= 2
+    for level in range(len(settings.rotors)):
+        yield Case(settings._replace(rotors=settings.rotors[:level] + settings.rotors[level + 1:],
+                                     positions=settings.positions[:level] + settings.positions[level + 1:],
+                                     notches=settings.notches[:level] + settings.notches[level + 1:]),
+                   ring_settings[:level] + ring_settings[level + 1:], message)
+    for pair in settings.plugboard:
+        yield case._replace(settings=settings._replace(
+            plugboard=tuple(other for other in settings.plugboard if pair[0] not in other)))
+    if settings.reflector != DEFAULT_REFLECTOR:
+        yield case._replace(settings=settings._replace(reflector=DEFAULT_REFLECTOR))
+    for level, (position, notch, ring_setting) in enumerate(zip(settings.positions, settings.notches, ring_settings)):
+        if position:
+            yield case._replace(settings=settings._replace(
+                positions=settings.positions[:level] + (0,) + settings.positions[level + 1:]))
+        if ring_setting:
+            yield case._replace(ring_settings=ring_settings[:level] + (0,) + ring_settings[level + 1:])
+        if isinstance(notch, tuple):
+            for single in notch:
+                yield case._replace(settings=settings._replace(
+                    notches=settings.notches[:level] + (single,) + settings.notches[level + 1:]))
+    for index, character in enumerate(message):
+        if character not in 'Aa ':
+            simpler = ' ' if character not in ALPHABET + ALPHABET.lower() else 'A'
+            yield case._replace(message=message[:index] + simpler + message[index + 1:])
+
+def shrink(case, engine):
+    # Greedily takes any simplification that still makes engine disagree with the reference,
+    # until none is left
+    shrunk = True
+    while shrunk:
+        shrunk = False
+        for smaller in _smaller_cases(case):
+            if check_case(smaller, [engine]):
+                case = smaller
+                shrunk = True
+                break
+    return case
+
+def fuzz(cases=1000, seed=0, engines=None, max_rotors=12, max_length=2000):
+    # Returns (engine, shrunk case, expected, got) for every engine that failed, shrinking the
+    # first failing case of each engine
+    rng = random.Random(seed)
+    engines = list(engines or available_engines())
+    failures = []
+    for _ in range(cases):
+        case = random_case(rng, max_rotors, max_length)
+        for name, _, _ in check_case(case, engines):
+            engines.remove(name)
+            case = shrink(case, name)
+            (_, expected, got), = check_case(case, [name])
+            failures.append((name, case, expected, got))
+        if not engines:
+            break
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Differential fuzzing of the Enigma engines against the reference")
+    parser.add_argument('--cases', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--engines', type=lambda text: text.split(','), default=None)
+    parser.add_argument('--max-rotors', type=int, default=12)
+    parser.add_argument('--max-length', type=int, default=2000)
+    args = parser.parse_args()
+
+    for name in args.engines or ():
+        if name not in ENGINES:
+            parser.error(f"Unknown engine {name!r}, expected one of {', '.join(ENGINES)}")
+
+    engines = args.engines or available_engines()
+    failures = fuzz(args.cases, args.seed, engines, args.max_rotors, args.max_length)
+    for name, case, expected, got in failures:
+        print(f"{name}: mismatch on")
+        print(f"  settings={case.settings!r}")
+        print(f"  ring_settings={case.ring_settings!r}")
+        print(f"  message={case.message!r}")
+        print(f"  expected={expected!r}")
+        print(f"  got={got!r}")
+    print(f"{args.cases} cases, {len(engines)} engines, {len(failures)} failing")
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
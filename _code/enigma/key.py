@@ -0,0 +1,115 @@
+from .core import EnigmaMachine, Rotor, count_carries, encrypt_codes, encrypt_text, load_numpy, select_backend
+
+class KeyState:
+    # Where one message stands in the keypress sequence of a CompiledKey: the number of
+    # keypresses since the key's start positions and the rotor positions they lead to. Small and
+    # cheap, one per message or per stream.
+    __slots__ = ('key', 'steps', 'positions')
+
+    def __init__(self, key, steps=0):
+        self.key = key
+        self.seek(steps)
+
+    def seek(self, steps):
+        if steps < 0:
+            raise ValueError("Cannot seek to a negative step")
+
+        self.steps = steps
+        self.positions = positions = []
+        for position, notch in zip(self.key.start_positions, self.key.notches):
+            positions.append((position + steps) % 26)
+            steps = count_carries(steps, position, notch)
+
+    def tell(self):
+        return self.steps
+
+class CompiledKey:
+    # The configuration of a machine, frozen and compiled once: rotor wirings, ring settings,
+    # notches, start positions, reflector and plugboard. Nothing in it changes while encrypting,
+    # so one key can be shared by any number of threads. Every message starts from the start
+    # positions unless it is given a KeyState to continue from.
+    __slots__ = ('wirings', 'ring_settings', 'notches', 'start_positions', 'reflector', 'plugboard',
+                 '_rotors', '_reflector', '_plugboard', '_encrypt')
+
+    def __init__(self, machine):
+        # The machine's start positions are used, wherever its rotors stand now. tell() first
+        # makes rotors set by hand since the last call the new start.
+        machine.tell()
+        rotors = []
+        for original, position in zip(machine.rotors, machine.start_positions):
+            rotor = Rotor(original.wiring, original.ring_setting)
+            rotor.set_position(position)
+            rotor.notch = original.notch
+            rotors.append(rotor)
+        reflector, plugboard = machine.reflector, machine.plugboard
+        reflector.compile()
+        plugboard.compile()
+        if load_numpy() is not None:
+            for rotor in rotors:
+                rotor.compile_arrays()
+
+        # Imported here, so importing the package stays free of threading
+        from .specialize import specialize
+
+        fields = {
+            'wirings': tuple(rotor.wiring for rotor in rotors),
+            'ring_settings': tuple(rotor.ring_setting for rotor in rotors),
+            'notches': tuple(rotor.notch for rotor in rotors),
+            'start_positions': tuple(rotor.position for rotor in rotors),
+            'reflector': reflector.wiring,
+            'plugboard': tuple(sorted(plugboard.wiring.items())),
+            '_rotors': tuple(rotors),
+            '_reflector': reflector,
+            '_plugboard': plugboard,
+            # Built from a machine that is never stepped, at the start positions
+            '_encrypt': specialize(EnigmaMachine(rotors, reflector, plugboard)),
+        }
+        for name, value in fields.items():
+            object.__setattr__(self, name, value)
+
+    @classmethod
+    def from_settings(cls, settings):
+        from .settings import MachineCache
+        return cls(MachineCache(maxsize=1).machine(settings))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CompiledKey is immutable")
+
+    def state(self, steps=0):
+        return KeyState(self, steps)
+
+    def encrypt_decrypt(self, message, state=None, backend='auto'):
+        # state, if given, is advanced past the message, so a stream can be encrypted in pieces.
+        # backend is 'compiled', 'numpy' or 'auto' to choose by length as EnigmaMachine does.
+        if state is None:
+            state = KeyState(self)
+        elif state.key is not self:
+            raise ValueError("The state belongs to a different key")
+        if backend not in ('auto', 'compiled', 'numpy'):
+            raise ValueError(f"Unknown backend {backend!r}, expected 'auto', 'compiled' or 'numpy'")
+        upper = message.upper()
+
+        np = load_numpy()
+        if backend == 'auto':
+            backend = select_backend(len(upper), len(self._rotors))
+        if backend == 'numpy':
+            if np is None:
+                raise RuntimeError("NumPy is required for the numpy backend")
+            encrypted = encrypt_text(upper, lambda codes: self._encrypt_codes(codes, state))
+        else:
+            encrypted, _ = self._encrypt(upper, list(state.positions))
+            state.seek(state.steps + len(upper))
+        return encrypted
+
+    def _encrypt_codes(self, codes, state):
+        encrypt_codes(codes, self._rotors, self.start_positions, state.steps, self._reflector, self._plugboard)
+        state.seek(state.steps + len(codes))
+
+    def map(self, messages, workers=None, backend='auto'):
+        # Encrypts every message from the start positions on a thread pool; results come back in
+        # order. Threads only run in parallel where the interpreter allows it: on free-threaded
+        # builds, or inside the NumPy gathers.
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(lambda message: self.encrypt_decrypt(message, backend=backend), messages))
@@ -0,0 +1,47 @@
+from .core import count_carries, load_numpy
+
+class KeystreamTable:
+    # The complete substitution (plugboard, rotors, reflector and back) for each of the first
+    # length keypresses of a machine, counted from its current step, as a [length, 26] uint8
+    # array. Messages sent in depth under the same key are then a single gather. If length
+    # covers the full rotor cycle of 26 ** rotors keypresses, the table wraps around and covers
+    # messages of any length.
+    def __init__(self, machine, length=None):
+        np = load_numpy()
+        if np is None:
+            raise RuntimeError("NumPy is required for KeystreamTable")
+
+        period = 26 ** len(machine.rotors)
+        if length is None and period > 26 ** 4:
+            raise ValueError("A table length is required for machines with more than 4 rotors.")
+        if length is None or length >= period:
+            length = period
+        self.cyclic = length == period
+        self.length = length
+
+        steps = machine.tell() + np.arange(length)
+        levels = []
+        codes = np.array(machine.plugboard.compile(), dtype=np.uint8)[None, :].repeat(length, axis=0)
+        for rotor, position in zip(machine.rotors, machine.start_positions):
+            positions = ((position + steps) % 26)[:, None]
+            forward_tables, backward_tables = rotor.compile_arrays()
+            levels.append((backward_tables, positions))
+            codes = forward_tables[positions, codes]
+            steps = count_carries(steps, position, rotor.notch)
+        codes = np.array(machine.reflector.compile(), dtype=np.uint8)[codes]
+        for table, positions in reversed(levels):
+            codes = table[positions, codes]
+        self.table = np.array(machine.plugboard.compile(), dtype=np.uint8)[codes]
+
+    def encrypt_decrypt(self, message, start=0):
+        # start is the keypress, relative to the table, at which the message begins
+        np = load_numpy()
+        codes = np.frombuffer(message.upper().encode('utf-32-le'), dtype=np.uint32).copy()
+        is_letter = (codes >= ord('A')) & (codes <= ord('Z'))
+        steps = start + np.flatnonzero(is_letter)
+        if self.cyclic:
+            steps %= self.length
+        elif len(steps) and steps[-1] >= self.length:
+            raise ValueError(f"The keystream table only covers {self.length} keypresses.")
+        codes[is_letter] = self.table[steps, codes[is_letter] - ord('A')] + ord('A')
+        return codes.tobytes().decode('utf-32-le')
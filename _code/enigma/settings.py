@@ -0,0 +1,80 @@
+from collections import OrderedDict, namedtuple
+
+from .core import ALPHABET, DEFAULT_REFLECTOR, EnigmaMachine, Plugboard, Reflector, Rotor, normalize_notch
+
+# Canonical, hashable machine configuration. Build it with make_settings.
+Settings = namedtuple('Settings', ['rotors', 'positions', 'notches', 'reflector', 'plugboard'])
+
+def check_settings(wirings, positions, notches, reflector):
+    if len(positions) != len(wirings) or len(notches) != len(wirings):
+        raise ValueError(f"Positions and notches must match the number of rotors ({len(wirings)}).")
+    for wiring in list(wirings) + [reflector]:
+        if len(wiring) != 26 or set(wiring) != set(ALPHABET):
+            raise ValueError("Rotor and reflector wirings must consist of 26 unique uppercase letters.")
+
+def make_settings(rotors, positions, notches, reflector=DEFAULT_REFLECTOR, plugboard=None):
+    # Wirings are upper-cased, positions and notches reduced modulo 26 (several notches on one
+    # rotor become a sorted tuple) and the plugboard kept as sorted pairs, so equal
+    # configurations always compare and hash equal
+    settings = Settings(
+        tuple(wiring.upper() for wiring in rotors),
+        tuple(int(position) % 26 for position in positions),
+        tuple(normalize_notch(notch) for notch in notches),
+        reflector.upper(),
+        tuple(sorted(Plugboard(plugboard).wiring.items())),
+    )
+    check_settings(settings.rotors, settings.positions, settings.notches, settings.reflector)
+    return settings
+
+class MachineCache:
+    # Bounded LRU cache of compiled machines keyed by Settings. Every call to machine() returns
+    # a new EnigmaMachine at the start positions built from the compiled tables. Each entry
+    # holds its own rotor tables, so they stay as long as the entry does. Safe to share between
+    # threads.
+    def __init__(self, maxsize=128):
+        # Imported here, so importing the package stays free of threading
+        import threading
+
+        self.maxsize = maxsize
+        self.compiled = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def machine(self, settings):
+        with self._lock:
+            compiled = self.compiled.get(settings)
+            if compiled is not None:
+                self.hits += 1
+                self.compiled.move_to_end(settings)
+        if compiled is None:
+            # Compiled outside the lock; two threads missing on the same settings both compile
+            # and the second result is dropped
+            check_settings(settings.rotors, settings.positions, settings.notches, settings.reflector)
+            reflector = Reflector(settings.reflector)
+            reflector.compile()
+            plugboard = Plugboard(dict(settings.plugboard))
+            plugboard.compile()
+            tables = tuple(Rotor(wiring).compile() for wiring in settings.rotors)
+            with self._lock:
+                self.misses += 1
+                compiled = self.compiled.setdefault(settings, (reflector, plugboard, tables))
+                if len(self.compiled) > self.maxsize:
+                    self.compiled.popitem(last=False)
+                    self.evictions += 1
+
+        reflector, plugboard, tables = compiled
+        rotors = []
+        for wiring, position, notch, rotor_tables in zip(settings.rotors, settings.positions, settings.notches,
+                                                         tables):
+            rotor = Rotor(wiring)
+            rotor.set_position(position)
+            rotor.set_notch(notch)
+            rotor._tables = rotor_tables
+            rotors.append(rotor)
+        return EnigmaMachine(rotors, reflector, plugboard)
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'size': len(self.compiled)}
@@ -0,0 +1,178 @@
+# Encryption functions generated for one fixed configuration. The rotor count, the notches and the
+# shape of the stepping are written into the source as constants, the plugboard is folded into
+# the tables of the first rotor and everything the loop touches is bound as a closure variable,
+# so a letter costs a handful of local lookups. Functions are cached per configuration and
+# checked against the reference engine before they are used.
+import threading
+from collections import OrderedDict
+
+from .core import ALPHABET
+
+SPECIALIZED_CACHE_SIZE = 64
+
+# Generated functions hold no state of their own and are safe to call from any thread; only the
+# cache around them needs the lock
+_specialized = OrderedDict()
+_specialized_lock = threading.Lock()
+
+def configuration_key(machine):
+    # Everything but the positions, which are passed to the generated function on every call
+    return (
+        tuple((rotor.wiring, rotor.ring_setting, rotor.notch) for rotor in machine.rotors),
+        machine.reflector.wiring,
+        tuple(sorted(machine.plugboard.wiring.items())),
+    )
+
+def _compose(forward, backward, inner):
+    return [backward[inner[forward[value]]] for value in range(26)]
+
+def _notch_test(name, notch):
+    if isinstance(notch, tuple):
+        return f"{name} in {notch!r}" if notch else "False"
+    return f"{name} == {notch!r}"
+
+def generate_source(machine):
+    # Source of make(...), which binds the tables and returns encrypt(upper, positions).
+    # positions is a list of rotor positions that is updated in place.
+    count = len(machine.rotors)
+    notches = [rotor.notch for rotor in machine.rotors]
+    lines = [
+        "def make(lookups, outputs, advance, forward_1, backward_1, top, carry):",
+        "    def encrypt(upper, positions):",
+        "        output = []",
+        "        append = output.append",
+    ]
+    if count == 0:
+        # Nothing moves, so the whole machine is a single translation
+        lines += [
+            "        return upper.translate(lookups), positions",
+            "    return encrypt",
+        ]
+        return '\n'.join(lines) + '\n'
+
+    lines.append("        position_0 = positions[0]")
+    if count >= 2:
+        lines += [
+            "        position_1 = positions[1]",
+            "        composites = [None] * len(positions) + [top]",
+            "        inner = carry(positions, composites, 2, False)",
+            "        composite = _compose(forward_1[position_1], backward_1[position_1], inner)",
+        ]
+    else:
+        lines.append("        composite = top")
+    lines += [
+        "        for letter in upper:",
+        "            code = lookups[position_0](letter)",
+        "            if code is not None:",
+        "                letter = outputs[position_0][composite[code]]",
+        "            append(letter)",
+        "            position_0 = advance[position_0]",
+    ]
+    if count >= 2:
+        lines += [
+            f"            if {_notch_test('position_0', notches[0])}:",
+            "                position_1 = advance[position_1]",
+        ]
+        if count >= 3:
+            lines += [
+                f"                if {_notch_test('position_1', notches[1])}:",
+                "                    inner = carry(positions, composites, 2, True)",
+            ]
+        lines.append("                composite = _compose(forward_1[position_1], backward_1[position_1], inner)")
+        lines.append("        positions[1] = position_1")
+    lines += [
+        "        positions[0] = position_0",
+        "        return ''.join(output), positions",
+        "    return encrypt",
+    ]
+    return '\n'.join(lines) + '\n'
+
+def _make_carry(machine):
+    # Stepping above the second rotor happens at most once every 26 * 26 keypresses, so it is
+    # left to a plain loop that keeps the composite of every level and rebuilds only the levels
+    # that moved
+    tables = [rotor.compile() for rotor in machine.rotors]
+    notches = [rotor.notch for rotor in machine.rotors]
+    advance = list(range(1, 26)) + [0]
+
+    def carry(positions, composites, level, step):
+        count = len(positions)
+        valid_from = count
+        index = level
+        while step and index < count:
+            positions[index] = position = advance[positions[index]]
+            valid_from = index + 1
+            notch = notches[index]
+            if not (position in notch if isinstance(notch, tuple) else position == notch):
+                break
+            index += 1
+        for index in range(count - 1, level - 1, -1):
+            if composites[index] is None or index < valid_from:
+                forward, backward = tables[index]
+                composites[index] = _compose(forward[positions[index]], backward[positions[index]],
+                                             composites[index + 1])
+        return composites[level]
+
+    return carry
+
+def _build(machine):
+    plugboard = machine.plugboard.compile()
+    reflector = machine.reflector.compile()
+    count = len(machine.rotors)
+    advance = list(range(1, 26)) + [0]
+    namespace = {'_compose': _compose}
+    exec(compile(generate_source(machine), f"<enigma specialized for {count} rotors>", 'exec'), namespace)
+
+    if count == 0:
+        letters = {ord(letter): ALPHABET[plugboard[reflector[plugboard[code]]]] for code, letter in enumerate(ALPHABET)}
+        return namespace['make'](letters, None, None, None, None, None, None)
+
+    # First rotor with the plugboard folded in: a letter goes straight to its code after rotor 0
+    # and a code after the backward pass straight to the output letter
+    forward_0, backward_0 = machine.rotors[0].compile()
+    lookups = [{letter: forward_0[position][plugboard[code]] for code, letter in enumerate(ALPHABET)}.get
+               for position in range(26)]
+    outputs = [''.join(ALPHABET[plugboard[code]] for code in backward_0[position]) for position in range(26)]
+    if count >= 2:
+        forward_1, backward_1 = machine.rotors[1].compile()
+    else:
+        forward_1 = backward_1 = None
+    return namespace['make'](lookups, outputs, advance, forward_1, backward_1, reflector, _make_carry(machine))
+
+# Long enough to carry into the third rotor, with non-letters that still step the rotors
+PROBE = (ALPHABET + " 0.") * 26
+
+def _check(machine, encrypt):
+    # The generated function has to agree with the reference engine before it is trusted
+    from .core import EnigmaMachine, Rotor
+    probe = PROBE
+    positions = [rotor.position for rotor in machine.rotors]
+    rotors = []
+    for original in machine.rotors:
+        rotor = Rotor(original.wiring, original.ring_setting)
+        rotor.set_position(original.position)
+        rotor.notch = original.notch
+        rotors.append(rotor)
+    reference = EnigmaMachine(rotors, machine.reflector, machine.plugboard, backend='reference')
+    expected = reference.encrypt_decrypt(probe)
+    got, positions = encrypt(probe, positions)
+    if got != expected or positions != [rotor.position for rotor in rotors]:
+        raise RuntimeError("The specialized encryption function disagrees with the reference engine")
+
+def specialize(machine):
+    # The generated encrypt(upper, positions) for the machine's configuration, from the cache
+    # if an equal configuration has been specialized before
+    key = configuration_key(machine)
+    with _specialized_lock:
+        encrypt = _specialized.get(key)
+        if encrypt is not None:
+            _specialized.move_to_end(key)
+            return encrypt
+
+    encrypt = _build(machine)
+    _check(machine, encrypt)
+    with _specialized_lock:
+        _specialized[key] = encrypt
+        if len(_specialized) > SPECIALIZED_CACHE_SIZE:
+            _specialized.popitem(last=False)
+    return encrypt
@@ -0,0 +1,70 @@
+# Optional hot-path instrumentation for EnigmaMachine. A machine only collects statistics while
+# it has a MachineStats attached, see EnigmaMachine.instrument.
+
+class MachineStats:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.characters = 0
+        self.letters = 0
+        self.rotations = 0
+        # Number of rotors moved by one keypress -> how many keypresses moved that many
+        self.carry_depths = {}
+        # Letters that reused the cached upper rotor stack, and letters that had to rebuild it
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # Engine that actually ran ('reference', 'table', 'compiled', 'numpy') -> characters
+        self.engines = {}
+        # Wall time of the instrumented calls, and the part of it spent in each phase. The
+        # NumPy paths time their phases directly, the table loop samples them and the
+        # reference and compiled engines only report the total.
+        self.seconds = 0.0
+        self.substitution_seconds = 0.0
+        self.stepping_seconds = 0.0
+
+    def merge(self, other):
+        # Adds the counts and timings of another MachineStats, e.g. one collected in a worker
+        self.characters += other.characters
+        self.letters += other.letters
+        self.rotations += other.rotations
+        for depth, count in other.carry_depths.items():
+            self.carry_depths[depth] = self.carry_depths.get(depth, 0) + count
+        self.cache_hits += other.cache_hits
+        self.cache_misses += other.cache_misses
+        for engine, characters in other.engines.items():
+            self.engines[engine] = self.engines.get(engine, 0) + characters
+        self.seconds += other.seconds
+        self.substitution_seconds += other.substitution_seconds
+        self.stepping_seconds += other.stepping_seconds
+
+    def as_dict(self):
+        return {
+            'characters': self.characters,
+            'letters': self.letters,
+            'rotations': self.rotations,
+            'carry_depths': dict(sorted(self.carry_depths.items())),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'engines': dict(sorted(self.engines.items())),
+            'seconds': self.seconds,
+            'substitution_seconds': self.substitution_seconds,
+            'stepping_seconds': self.stepping_seconds,
+        }
+
+class Instrumentation:
+    # Context manager returned by EnigmaMachine.instrument: attaches the stats for the duration of
+    # the with block and restores whatever was attached before
+    def __init__(self, machine, stats):
+        self.machine = machine
+        self.stats = stats
+        self.previous = None
+
+    def __enter__(self):
+        self.previous = self.machine.stats
+        self.machine.stats = self.stats
+        return self.stats
+
+    def __exit__(self, *exc_info):
+        self.machine.stats = self.previous
+        return False
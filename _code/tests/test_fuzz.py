@@ -0,0 +1,66 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from enigma import DEFAULT_REFLECTOR, EnigmaMachine, Plugboard, Reflector, Rotor
+from enigma.catalog import ROTORS
+from enigma.core import INTO_CHUNK_SIZE
+from enigma.fuzz import fuzz
+
+def make_machine(backend='auto'):
+    rotors = []
+    for number, ring_setting, position, notch in [('1', 3, 5, 16), ('2', 0, 21, (4, 17)), ('3', 11, 8, 21)]:
+        rotor = Rotor(ROTORS[number], ring_setting)
+        rotor.set_position(position)
+        rotor.set_notch(notch)
+        rotors.append(rotor)
+    return EnigmaMachine(rotors, Reflector(DEFAULT_REFLECTOR), Plugboard({'A': 'Q', 'Q': 'A', 'E': 'Z', 'Z': 'E'}),
+                         backend)
+
+def sample_bytes(length):
+    text = "Un café, s'il vous plaît! 1234\n".encode('utf-8')
+    return (text * (length // len(text) + 1))[:length]
+
+def test_engines_agree_with_reference():
+    failures = fuzz(cases=50, seed=0)
+    assert not failures, failures[0]
+
+def test_decrypt_range_of_non_ascii_file(tmp_path):
+    plaintext = sample_bytes(5000)
+    (tmp_path / 'plain').write_bytes(plaintext)
+    make_machine().encrypt_decrypt_mmap(tmp_path / 'plain', tmp_path / 'cipher')
+
+    decrypted = make_machine().decrypt_range(tmp_path / 'cipher', 1001, 3000)
+    assert decrypted.encode('latin-1') == plaintext[1001:4001].upper()
+
+def test_checkpoint_resume_continues_the_keystream():
+    message = sample_bytes(10000).decode('latin-1')
+    expected = make_machine('table').encrypt_decrypt(message)
+
+    machine = make_machine()
+    first = machine.encrypt_decrypt(message[:4321])
+    blob = machine.checkpoint().to_bytes()
+
+    resumed = make_machine()
+    resumed.resume(blob)
+    assert first + resumed.encrypt_decrypt(message[4321:]) == expected
+
+    other = make_machine()
+    other.rotors[0].set_position(0)
+    with pytest.raises(ValueError):
+        other.resume(blob)
+
+@pytest.mark.parametrize('preserve_case', [False, True])
+def test_encrypt_into_across_chunk_boundary(preserve_case):
+    data = bytearray(sample_bytes(INTO_CHUNK_SIZE + 5000))
+    expected = make_machine('table').encrypt_decrypt(data.decode('latin-1'), preserve_case).encode('latin-1')
+
+    # The second call starts 1000 bytes before the end of the first chunk
+    machine = make_machine()
+    middle = INTO_CHUNK_SIZE - 1000
+    machine.encrypt_into(data[:middle], memoryview(data)[:middle], preserve_case)
+    machine.encrypt_into(memoryview(data)[middle:], memoryview(data)[middle:], preserve_case)
+    assert data == expected
@@ -1,94 +1,19 @@
+import os
 import sys
 import string
 from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton, QTextEdit, QMessageBox, QSpinBox, QTabWidget, QRadioButton, QButtonGroup
 from PyQt5.QtGui import QFont
 from PyQt5.QtCore import Qt
 
-class Rotor:
-    def __init__(self, wiring, ring_setting=0):
-        self.wiring = wiring.upper()
-        self.ring_setting = ring_setting
-        self.position = 0
-        self.notch = 0  # Notch will be set by the user
-
-    def set_position(self, position):
-        self.position = position % 26
-
-    def set_notch(self, notch):
-        self.notch = notch % 26
-
-    def rotate(self):
-        self.position = (self.position + 1) % 26
-        return self.position == self.notch
-
-    def forward(self, letter):
-        index = (string.ascii_uppercase.index(letter) + self.position - self.ring_setting) % 26
-        letter = self.wiring[index]
-        return string.ascii_uppercase[(string.ascii_uppercase.index(letter) - self.position + self.ring_setting) % 26]
-
-    def backward(self, letter):
-        index = (string.ascii_uppercase.index(letter) + self.position - self.ring_setting) % 26
-        letter = string.ascii_uppercase[self.wiring.index(string.ascii_uppercase[index])]
-        return string.ascii_uppercase[(string.ascii_uppercase.index(letter) - self.position + self.ring_setting) % 26]
-
-class Reflector:
-    def __init__(self, wiring):
-        self.wiring = wiring.upper()
-
-    def reflect(self, letter):
-        index = string.ascii_uppercase.index(letter)
-        return self.wiring[index]
-
-class Plugboard:
-    def __init__(self, wiring=None):
-        if wiring is None:
-            wiring = {}
-        self.wiring = {k.upper(): v.upper() for k, v in wiring.items()}
-
-    def swap(self, letter):
-        return self.wiring.get(letter, letter)
-
-class EnigmaMachine:
-    def __init__(self, rotors, reflector, plugboard):
-        self.rotors = rotors
-        self.reflector = reflector
-        self.plugboard = plugboard
-
-    def encrypt_decrypt(self, message):
-        encrypted_message = []
-
-        for letter in message.upper():
-            if letter in string.ascii_uppercase:
-                # Pass through the plugboard
-                letter = self.plugboard.swap(letter)
-
-                # Pass through the rotors forward
-                for rotor in self.rotors:
-                    letter = rotor.forward(letter)
-
-                # Pass through the reflector
-                letter = self.reflector.reflect(letter)
-
-                # Pass through the rotors backward
-                for rotor in reversed(self.rotors):
-                    letter = rotor.backward(letter)
-
-                # Pass through the plugboard again
-                letter = self.plugboard.swap(letter)
-            # Numbers and special characters are unchanged
-            encrypted_message.append(letter)
-
-            # Rotate the rotors
-            rotate_next = True
-            for rotor in self.rotors:
-                if rotate_next:
-                    rotate_next = rotor.rotate()
-
-        return ''.join(encrypted_message)
+# The engine package lives in _code/enigma
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, '_code'))
+from enigma import DEFAULT_REFLECTOR, MachineCache, make_settings
+from enigma.catalog import ROTORS
 
 class EnigmaGUI(QWidget):
     def __init__(self):
         super().__init__()
+        self.machine_cache = MachineCache()
         self.initUI()
 
     def initUI(self):
@@ -253,108 +178,7 @@ class EnigmaGUI(QWidget):
             self.custom_reflector_input.setEnabled(False)
 
     def get_rotors(self):
-        available_rotors = {
-            "1": "SAVJNMITYPOEFWUQZLBGKHXCDR",
-            "2": "LKJWSPFIYGMDQOZAERXTHVUBCN",
-            "3": "ZBJFAXHUTGVESDYMQIPWKRCLNO",
-            "4": "MXTDWJYQFNOVCPSUGIZLREHKAB",
-            "5": "BTJZRFLQICKSHEPOAVNXDGUMYW",
-            "6": "PBDMILKECVFUAZOSHWGJRYTQNX",
-            "7": "XODCYKNJRPSFVMZLATUEQIGWBH",
-            "8": "ZRLHTBCYGUOAJWKSQXNMVEPIDF",
-            "9": "XSYBPRJWEHAICKUFZVTOLGMNDQ",
-            "10": "FSUZWPADGEHCBQNJLTVXORKMYI",
-            "11": "FMAXBQDCTRHSIEVYPJNGOWLUZK",
-            "12": "KTBNZLUDVCJXIPFMEOHQGYARWS",
-            "13": "JWGCULEBSHATZKIQMROFDNYPVX",
-            "14": "TXRZPJFLNGSMHBAKOIDUYCVWEQ",
-            "15": "BQRFCKXAWMSTDHYZEGPLJUNIOV",
-            "16": "RPGDVLTZKYMFIAUJHBQXNOSWCE",
-            "17": "UNJTOVMQSEGZDCAHPWBFKRLXIY",
-            "18": "OVLCJXHSWZADPYTBIRMEKGFQUN",
-            "19": "IHXBFGLVNSJPAYQMWZTKOCUDER",
-            "20": "YSTJDROWCKULVBZFQHGAEIPXMN",
-            "21": "XNHSKMGOYCWJVQEZATILRPDBUF",
-            "22": "WKCIJYZFODBEXUARGNPVLHTQMS",
-            "23": "EHXGNCYASPQLFJVTMDWBRZKIUO",
-            "24": "FMTBLPIJGQDWKRVESHXOUCZNYA",
-            "25": "MUGFTOLIBJWQVYPHKNZRDXACES",
-            "26": "YSZUKLNGJITEQDVBPOCAFHRMXW",
-            "27": "SNICQZLKMJOXHABRPFYEDUWGVT",
-            "28": "OPYEWBQAZGJTXHCLUFNDIKRSVM",
-            "29": "WXUZEJGDVSHYFTQILAOMNPCRBK",
-            "30": "CDUGTEKXLMIRVQAWPNYFSBOHZJ",
-            "31": "IOSNDGKCAFQVXMZEWHBRPTLYJU",
-            "32": "JZHMXUFAWTNRDBPLKVGSYOQEIC",
-            "33": "FQURHXEGIAODBSZVWKTLYPMCJN",
-            "34": "ILRPGETQHUFJWXADBYOCSNZMKV",
-            "35": "OXLNEJPCIYGMWQRUTFASHZVDKB",
-            "36": "URGSLZMYEFDXIJTPVWAQHKCBON",
-            "37": "LGSFIYDHVUKRQAPMOXZNWEBTCJ",
-            "38": "HMJWQXCANPSUFOYZLTGRDBEVIK",
-            "39": "NLRETQUIDSAPKHZWXGVFJCBMYO",
-            "40": "DQMFZWRVNPHOLSBIJTEKCGUXYA",
-            "41": "YKQNOTVDWLXMZPSJABCIUEFHGR",
-            "42": "IMDUQZKWTGEAXNBLPSJROFCVHY",
-            "43": "UZAEFMNYPCTDXGLIRWSQOVKJHB",
-            "44": "LTVEFNBGJZSKQHUPDMWICXOAYR",
-            "45": "AIGEORXBTPYJZDUWCVMLFNSHQK",
-            "46": "SWABFLIJEXDRNVOCTGMHPQZYUK",
-            "47": "ODHGALECIMYFQUXTNJWRZPKBSV",
-            "48": "CUMHOBTJYXZLAQPFRGDNVIWESK",
-            "49": "LPVTZNYSQMOHAIRUKXGEFBDCWJ",
-            "50": "GVONKIJLYRMPZXSEWTUFQAHDCB",
-            "51": "WYLKCFAJVNMXEDUQTBOGIPZHSR",
-            "52": "JCOXUEMLPDBFIWZGANRKSQTHYV",
-            "53": "WALEHKBMGYRCVXTDUOSPJZFIQN",
-            "54": "ZBSUJALFWIHDQXVPRMYTCKGENO",
-            "55": "GNTSAPZLIVYRFCMDWXOQJEKHBU",
-            "56": "LICEZJUKBHGAOMNRVTQDFSPXYW",
-            "57": "AMRJEXYHUVDGCPZTSLFIBWKNQO",
-            "58": "TCJZLWEHIVRKGABSXNDPFQMYUO",
-            "59": "BLEFGSPIVOQXJHMDKUNWZYCRTA",
-            "60": "ZEYJMLVTKNCSXOAGRIQBFHPWUD",
-            "61": "NPRBIFELDKSMHJCWOGUTXAYZVQ",
-            "62": "LQPIYEFZTJCRUOGBKXAHDSNVWM",
-            "63": "OXQIZBGJHDCVTPRSELFYMKAUWN",
-            "64": "YCJITLBHESDPOZWAFVMQGUXKNR",
-            "65": "RPFOHELVIYZDWTGCUKBNAJXQMS",
-            "66": "PZTYCHKOUISDJFWAXEGLNMQRBV",
-            "67": "UASFPGQLZJROKXWBNYVDMEHTIC",
-            "68": "CVHYMIJAUDTGPFSEXOZWQRLNBK",
-            "69": "TMFWHBRUNKPQYLJAGZEOCDISVX",
-            "70": "PZOCKGQRXFMIEJANWLBDSUYVTH",
-            "71": "TXUVGASNPJRHYFDQBLMZKCIOWE",
-            "72": "GAVNCLIXTPFJRDUKHWOQZMSYEB",
-            "73": "OASBXUDGJQRMWCFHNETLYVPKIZ",
-            "74": "CAZXNBVLTDREIOYSUWQMGJHKPF",
-            "75": "OKZNWDHUMSRBVTIXEPCJAFYQGL",
-            "76": "KCBHEUSQMOLRIJTFAZYDWNPXGV",
-            "77": "OWGAXKFECPLDMZYTRIJHUNQVBS",
-            "78": "MRQYUWJEGONIXKVTBLCDHSAFPZ",
-            "79": "WGXYEOLQKFPIJSVRNTBCZDAHMU",
-            "80": "MKWAYIXNVJOUDLQRTCEPBGSHZF",
-            "81": "YRCLPFZHQBSOEDVKIGWTAUXMJN",
-            "82": "AVCYGRIUHBTOMFEPXNSQZKWJDL",
-            "83": "JHPVNKZMQBXDOULACWSYGTFERI",
-            "84": "CRNUFBLTVEYSJPWXGAOIMDHQKZ",
-            "85": "IVMEHTQADNJKPFZUBCSYLGXOWR",
-            "86": "ZEWADVMBSFUCGOIHTJXYRPNKLQ",
-            "87": "FODBGMUSVPJELYINWKTXCQZHRA",
-            "88": "NXGEDVYPQZSHWKRFAMILJTOUCB",
-            "89": "MVKYIGHQXNPLEWBSFUOZJTRCDA",
-            "90": "KDTCLBERAIPMUONQZHWYFSXGVJ",
-            "91": "SIHZWTREJPNQXOALVMDUBKFCGY",
-            "92": "XGPBJAHDZQKMNOCVSTYIURLFEW",
-            "93": "UEYTWNHRBZGQVLIAJMSCXDPKOF",
-            "94": "YAODGRBXLKCWFZHQSVIPUENJMT",
-            "95": "CXLGASYVZEJBUTRFHQPDNMKOIW",
-            "96": "GWIVYURFHTPDSOCQELMXJZABKN",
-            "97": "ATBKDXGPNEJYCISZMWQUROVHFL",
-            "98": "NUMRFXDCBJQPYVGTWIAZELKOSH",
-            "99": "EKGBUXCSFWVLNMAIDTHZRPYOJQ",
-            "100": "VSXUEMYRATDPWHJCLOGZQIFBKN",
-        }
+        available_rotors = ROTORS
 
         rotor_order = [int(x) for x in self.order_input.text().split()]
         if len(set(rotor_order)) != len(rotor_order):
@@ -376,10 +200,7 @@ class EnigmaGUI(QWidget):
         for i in range(len(rotor_order)):
             rotor_number = str(rotor_order[i])
             if rotor_number in available_rotors:
-                rotor = Rotor(available_rotors[rotor_number])
-                rotor.set_position(rotor_positions[i])
-                rotor.set_notch(notch_positions[i])
-                rotors.append(rotor)
+                rotors.append((available_rotors[rotor_number], rotor_positions[i], notch_positions[i]))
             else:
                 QMessageBox.warning(self, "Input Error", f"Rotor {rotor_number} is not available.")
                 return []
@@ -390,12 +211,12 @@ class EnigmaGUI(QWidget):
         if self.yes_radio.isChecked():
             custom_wiring = self.custom_reflector_input.text().strip().upper()
             if len(custom_wiring) == 26 and set(custom_wiring) == set(string.ascii_uppercase):
-                return Reflector(custom_wiring)
+                return custom_wiring
             else:
                 QMessageBox.warning(self, "Input Error", "Custom reflector wiring must consist of 26 unique uppercase letters.")
                 return None
         else:
-            return Reflector("YRUHQSLDPXNGOKMIEBFZCWVJAT")  # Default reflector
+            return DEFAULT_REFLECTOR  # Default reflector
 
     def get_plugboard(self):
         plugboard_pairs = self.plugboard_input.text().upper()
@@ -406,30 +227,32 @@ class EnigmaGUI(QWidget):
                 if len(pair) == 2:
                     plugboard_dict[pair[0]] = pair[1]
                     plugboard_dict[pair[1]] = pair[0]
-        return Plugboard(plugboard_dict)
+        return plugboard_dict
 
-    def encrypt_message(self):
+    def get_machine(self):
         rotors = self.get_rotors()
         if not rotors:
-            return
+            return None
         reflector = self.get_reflector()
         if not reflector:
-            return
+            return None
         plugboard = self.get_plugboard()
-        enigma = EnigmaMachine(rotors, reflector, plugboard)
+        wirings, positions, notches = zip(*rotors)
+        # Identical settings reuse the compiled tables from earlier clicks
+        return self.machine_cache.machine(make_settings(wirings, positions, notches, reflector, plugboard))
+
+    def encrypt_message(self):
+        enigma = self.get_machine()
+        if not enigma:
+            return
         message = self.message_input.toPlainText()
         encrypted_message = enigma.encrypt_decrypt(message)
         self.output_area.setText(f"Encrypted message: {encrypted_message}")
 
     def decrypt_message(self):
-        rotors = self.get_rotors()
-        if not rotors:
+        enigma = self.get_machine()
+        if not enigma:
             return
-        reflector = self.get_reflector()
-        if not reflector:
-            return
-        plugboard = self.get_plugboard()
-        enigma = EnigmaMachine(rotors, reflector, plugboard)
         message = self.message_input.toPlainText()
         decrypted_message = enigma.encrypt_decrypt(message)
         self.output_area.setText(f"Decrypted message: {decrypted_message}")